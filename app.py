@@ -1,22 +1,37 @@
-from flask import Flask, request, jsonify
-import requests
+from flask import Flask, request, jsonify, Response, stream_with_context
 import re
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 import time
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import json
-from datetime import datetime, timedelta
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import random
 import threading
 import os
 from dotenv import load_dotenv
 import chromedriver_autoinstaller
+import atexit
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from browser_pool import BrowserPool
+import chrome_profile
+from chat_state import create_chat_state_store, BLOCKED, THROTTLED, UNBLOCKED
+from cmc_client import CMCClient
+from cmc_pages import CMCPageFetcher, MarketDataParseError, pair_liquidity_from_next_data
+from http_client import HttpClient
+from job_queue import JobQueue
+from pipeline import FanOut, Pipeline, PipelineError, Stage
+from policy import PolicyStore
+from metrics import REGISTRY, span, timed, log_event, new_trace_id, set_trace_id, get_trace_id
+from numparse import parse_dollar, parse_scores
+from result_cache import ResultCache, Stored
+from singleflight import SingleFlight
+from slug_index import SlugIndex
+from snapshot_store import SnapshotStore
+from telegram_outbox import TelegramOutbox
+import tiers
 
 # Load environment variables
 load_dotenv()
@@ -25,77 +40,203 @@ app = Flask(__name__)
 
 # Get environment variables with fallbacks
 CMC_API_KEY = os.getenv('CMC_API_KEY', 'fa253a05-6e6d-4993-8f69-a8e3ad522a49')
-CMC_INFO_URL = 'https://pro-api.coinmarketcap.com/v2/cryptocurrency/info'
-CMC_MAP_URL = 'https://pro-api.coinmarketcap.com/v1/cryptocurrency/map'
+# Base URLs are overridable so the benchmark suite can point everything at local stubs
+CMC_PRO_API_BASE = os.getenv('CMC_PRO_API_BASE', 'https://pro-api.coinmarketcap.com')
+CMC_SITE_URL = os.getenv('CMC_SITE_URL', 'https://coinmarketcap.com')
+CMC_DATA_API_URL = os.getenv('CMC_DATA_API_URL', 'https://api.coinmarketcap.com/data-api')
+CMC_INFO_URL = f'{CMC_PRO_API_BASE}/v2/cryptocurrency/info'
+CMC_MAP_URL = f'{CMC_PRO_API_BASE}/v1/cryptocurrency/map'
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '7678977006:AAEOLzVop7uhMLACStxxn0IOXGnI6iiP5Pg')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID', '8012302240')
-TELEGRAM_API_URL = f'https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage'
+TELEGRAM_API_ROOT = os.getenv('TELEGRAM_API_ROOT', 'https://api.telegram.org')
+TELEGRAM_API_BASE = f'{TELEGRAM_API_ROOT}/bot{TELEGRAM_BOT_TOKEN}'
+TELEGRAM_API_URL = f'{TELEGRAM_API_BASE}/sendMessage'
+# Telegram send limits enforced by the outbox: messages/second overall and seconds between messages to one chat
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 25))
+TELEGRAM_CHAT_INTERVAL = float(os.getenv('TELEGRAM_CHAT_INTERVAL', 1.0))
+CMC_MAP_SNAPSHOT_PATH = os.getenv('CMC_MAP_SNAPSHOT_PATH', 'cmc_map_snapshot.json')
+CMC_MAP_TTL_SECONDS = int(os.getenv('CMC_MAP_TTL_SECONDS', 6 * 60 * 60))
+BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', 2))
+BROWSER_MAX_USES = int(os.getenv('BROWSER_MAX_USES', 50))
+BROWSER_POOL_PREWARM = os.getenv('BROWSER_POOL_PREWARM', '1') == '1'
+# Lean scraping profile: no images, fonts, media, ads or trackers, background Chrome
+# services off. Page load strategy 'eager' returns from driver.get at DOMContentLoaded.
+BROWSER_LEAN = os.getenv('BROWSER_LEAN', '1') == '1'
+BROWSER_PAGE_LOAD_STRATEGY = os.getenv('BROWSER_PAGE_LOAD_STRATEGY', 'eager' if BROWSER_LEAN else 'normal')
+# Opt-in only: turns off Chrome site isolation in the lean profile to save renderer
+# memory, at the cost of no longer isolating the scraped pages' third-party scripts
+BROWSER_DISABLE_SITE_ISOLATION = os.getenv('BROWSER_DISABLE_SITE_ISOLATION', '0') == '1'
+# Extra Network.setBlockedURLs patterns for the lean profile, comma separated
+BROWSER_BLOCKED_URLS = [p.strip() for p in os.getenv('BROWSER_BLOCKED_URLS', '').split(',')]
+# Background proposal processing for /webhook: worker count and max queued jobs
+PROPOSAL_WORKERS = int(os.getenv('PROPOSAL_WORKERS', BROWSER_POOL_SIZE))
+PROPOSAL_QUEUE_SIZE = int(os.getenv('PROPOSAL_QUEUE_SIZE', 20))
+# Per-slug market snapshot cache: fresh for RESULT_CACHE_TTL, then served stale
+# for up to RESULT_CACHE_STALE_TTL more while one background refresh runs
+RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', 300))
+RESULT_CACHE_STALE_TTL = int(os.getenv('RESULT_CACHE_STALE_TTL', 900))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', 256))
+# Every snapshot is also written to SNAPSHOT_DB (empty to disable). A stored snapshot
+# younger than SNAPSHOT_FRESH_SECONDS is reused instead of scraping, including
+# after a restart or from another worker; history is kept SNAPSHOT_RETENTION_DAYS.
+SNAPSHOT_DB = os.getenv('SNAPSHOT_DB', 'snapshots.sqlite3')
+SNAPSHOT_FRESH_SECONDS = int(os.getenv('SNAPSHOT_FRESH_SECONDS', RESULT_CACHE_TTL))
+SNAPSHOT_RETENTION_DAYS = int(os.getenv('SNAPSHOT_RETENTION_DAYS', 90))
+# Most stored snapshots one /crypto/rescore call re-evaluates
+RESCORE_MAX_LIMIT = int(os.getenv('RESCORE_MAX_LIMIT', 10000))
+# Seconds a proposal waits for its market snapshot before giving up (0 = no limit)
+PIPELINE_SCRAPE_TIMEOUT = float(os.getenv('PIPELINE_SCRAPE_TIMEOUT', 180))
+# Batch evaluation: max slugs per request and how many scrape at once
+BATCH_MAX_SLUGS = int(os.getenv('BATCH_MAX_SLUGS', 200))
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', BROWSER_POOL_SIZE))
+# The parts of a snapshot (CMC metadata, CEX markets, DEX market + pair page, market
+# cap/volume) are fetched in parallel. Seconds each part may take, and the deadline for
+# all of them, after which the snapshot is built from whatever finished.
+SNAPSHOT_DEADLINE = float(os.getenv('SNAPSHOT_DEADLINE', 150))
+SNAPSHOT_INFO_TIMEOUT = float(os.getenv('SNAPSHOT_INFO_TIMEOUT', 20))
+SNAPSHOT_MARKETS_TIMEOUT = float(os.getenv('SNAPSHOT_MARKETS_TIMEOUT', 120))
+SNAPSHOT_STATS_TIMEOUT = float(os.getenv('SNAPSHOT_STATS_TIMEOUT', 60))
+SNAPSHOT_FANOUT_WORKERS = int(os.getenv('SNAPSHOT_FANOUT_WORKERS', 4 * (PROPOSAL_WORKERS + BATCH_CONCURRENCY)))
+# How long a single-slug CMC info lookup waits for others to share its request
+CMC_BATCH_WINDOW_MS = int(os.getenv('CMC_BATCH_WINDOW_MS', 50))
+# Outbound HTTP: connections kept per host (enough for every worker thread) and default timeout
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', max(PROPOSAL_WORKERS, BATCH_CONCURRENCY) + 4))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 15))
+# Where market data comes from: 'auto' tries the plain-HTTP JSON path and falls back
+# to Selenium if parsing fails, 'http' never starts a browser, 'selenium' always does.
+# Stays on 'selenium' until the parser fixtures are recorded from the live site
+# (python cmc_pages.py --record <slug>) instead of hand-built.
+MARKET_DATA_SOURCE = os.getenv('MARKET_DATA_SOURCE', 'selenium').lower()
+# Scraper wait ceilings (seconds). Every wait returns as soon as its DOM condition holds.
+SCRAPE_PAGE_TIMEOUT = float(os.getenv('SCRAPE_PAGE_TIMEOUT', 15))
+SCRAPE_ACTION_TIMEOUT = float(os.getenv('SCRAPE_ACTION_TIMEOUT', 5))
+SCRAPE_PAIR_TIMEOUT = float(os.getenv('SCRAPE_PAIR_TIMEOUT', 10))
+# DEX pair pool liquidity is cached per pair URL for this long (seconds)
+PAIR_LIQUIDITY_TTL = int(os.getenv('PAIR_LIQUIDITY_TTL', 600))
+# Share of failed page reads whose full page source is saved for debugging (0 never, 1 always)
+PAGE_SOURCE_SAMPLE_RATE = float(os.getenv('PAGE_SOURCE_SAMPLE_RATE', 0))
+# Debug mode highlights the rows/values that were read and pauses so a headed browser can be watched
+SCRAPE_DEBUG = os.getenv('SCRAPE_DEBUG', '0') == '1'
+SCRAPE_DEBUG_PAUSE = float(os.getenv('SCRAPE_DEBUG_PAUSE', 3))
+# Per-chat webhook state: messages allowed back to back before the cooldown kicks in,
+# how long an idle chat is remembered and how many chats are kept at most
+CHAT_BURST = int(os.getenv('CHAT_BURST', 1))
+CHAT_STATE_TTL_SECONDS = int(os.getenv('CHAT_STATE_TTL_SECONDS', 3600))
+CHAT_STATE_MAX_CHATS = int(os.getenv('CHAT_STATE_MAX_CHATS', 10000))
+# 'memory' keeps that state per process; 'sqlite' shares it between all gunicorn
+# workers on the host through CHAT_STATE_DB, so cooldowns and dedupe hold across workers
+CHAT_STATE_BACKEND = os.getenv('CHAT_STATE_BACKEND', 'memory').lower()
+CHAT_STATE_DB = os.getenv('CHAT_STATE_DB', 'chat_state.sqlite3')
+
+# Exchange lists and tier tables; the file is re-read when it changes
+POLICY_PATH = os.getenv('POLICY_PATH', 'policy.json')
+POLICY_RELOAD_SECONDS = float(os.getenv('POLICY_RELOAD_SECONDS', 5))
 
 CMC_URL_REGEX = re.compile(r'https?://coinmarketcap\.com/currencies/[^/]+/?')
+ON_IT_MESSAGE = "I'm on it! I'm working on generating an investment proposal based on the details provided in the link."
 
-# Add these global variables
-last_processed_message_id_per_chat = {}
-last_message_time_per_chat = {}
-spam_attempts_per_chat = {}  # Track spam attempts per chat
 BLOCK_DURATION = 10  # Block duration in seconds
 COOLDOWN_SECONDS = 2  # Cooldown period in seconds
-chat_locks = {}
+
+# Chat locks, spam cooldown (a token bucket refilling one message per COOLDOWN_SECONDS)
+# and handled-update dedupe, bounded and expiring instead of ever-growing dicts
+chat_state = create_chat_state_store(CHAT_STATE_BACKEND, CHAT_STATE_DB, rate=1 / COOLDOWN_SECONDS, burst=CHAT_BURST,
+                                     block_duration=BLOCK_DURATION, ttl=CHAT_STATE_TTL_SECONDS,
+                                     max_chats=CHAT_STATE_MAX_CHATS)
 
 def format_dollar(amount):
     if amount is None:
         return None
     return "${:,.0f}".format(amount)
 
-def get_symbol_from_slug(slug):
-    headers = {'X-CMC_PRO_API_KEY': CMC_API_KEY}
-    params = {'listing_status': 'active'}
-    response = requests.get(CMC_MAP_URL, headers=headers, params=params)
-    data = response.json()
-    if 'data' in data:
-        for coin in data['data']:
-            if coin['slug'].lower() == slug.lower():
-                return coin['symbol']
-    return None
+# Business rules, swapped in whole whenever POLICY_PATH changes on disk
+policy_store = PolicyStore(POLICY_PATH, interval=POLICY_RELOAD_SECONDS)
+policy_store.start()
+
+# Every outbound HTTP call (CMC, Telegram) goes through this pooled client
+http = HttpClient(pool_size=HTTP_POOL_SIZE, timeout=HTTP_TIMEOUT)
+
+# All CoinMarketCap Pro API traffic goes through this batching client
+cmc_client = CMCClient(http, CMC_API_KEY, CMC_INFO_URL, CMC_MAP_URL, batch_window=CMC_BATCH_WINDOW_MS / 1000)
+
+# Reads CMC page data (__NEXT_DATA__, market-pairs JSON) without a browser
+cmc_pages = CMCPageFetcher(http, site_url=CMC_SITE_URL, data_api_url=CMC_DATA_API_URL, timeout=HTTP_TIMEOUT)
+
+# Every Telegram message is queued here and sent by a rate-aware background sender
+telegram_outbox = TelegramOutbox(http, TELEGRAM_API_BASE, global_rate=TELEGRAM_GLOBAL_RATE,
+                                 chat_interval=TELEGRAM_CHAT_INTERVAL)
+telegram_outbox.start()
+atexit.register(telegram_outbox.flush)
+
+# slug -> coin (and symbol/id -> coin) index, loaded from disk and refreshed in the background
+slug_index = SlugIndex(timed('cmc_map', cmc_client.fetch_map), CMC_MAP_SNAPSHOT_PATH, CMC_MAP_TTL_SECONDS)
+slug_index.start()
 
 def get_id_from_slug(slug):
-    symbol = get_symbol_from_slug(slug)
-    if not symbol:
-        print(f"Could not find symbol for slug: {slug}")
+    # Token metadata for slug: a dict probe in the slug index (map rows carry the
+    # name, symbol and platform/token_address a snapshot needs), else
+    # /v2/cryptocurrency/info?slug=... for listings newer than the index, batched
+    # with any other lookups in flight. None when neither knows the slug; raises
+    # when CMC can't be reached.
+    with span('slug_index', slug=slug):
+        token_info = slug_index.get(slug)
+    if token_info:
+        return token_info
+    with span('cmc_info', slug=slug):
+        token_info = cmc_client.info_by_slug(slug)
+    if not token_info:
+        print(f"Could not find token info for slug: {slug}")
         return None
-    headers = {'X-CMC_PRO_API_KEY': CMC_API_KEY}
-    params = {'symbol': symbol}
-    response = requests.get(CMC_INFO_URL, headers=headers, params=params)
-    data = response.json()
-    print("CMC INFO API response:", data)
-    if 'data' in data and data['data']:
-        token_info = None
-        for v in data['data'].values():
-            if isinstance(v, list):
-                token_info = v[0]
-            elif isinstance(v, dict):
-                token_info = v
-            break
-        if not token_info:
-            # fallback or error
-            token_info = {}
-    else:
-        print("Error from CMC API:", data)
-        token_info = None
     return token_info
 
-def parse_volume(volume_str):
+def get_token_infos_by_slug(slugs):
+    # {slug: token_info} for every slug the slug index or one bulk info call
+    # knows; the rest are unknown to CMC. None when CMC couldn't be reached.
+    infos = {}
+    for slug in slugs:
+        coin = slug_index.get(slug)
+        if coin:
+            infos[slug] = coin
+    rest = [slug for slug in slugs if slug not in infos]
+    if not rest:
+        return infos
     try:
-        return float(volume_str.replace('$', '').replace(',', '').replace('*', '').replace('**', '').strip())
-    except:
-        return 0
+        with span('cmc_info_bulk', count=len(rest)):
+            infos.update(cmc_client.info_by_slugs(rest))
+    except Exception as e:
+        print(f"Error from CMC bulk info API: {e}")
+        return None
+    return infos
 
 def highlight_element(driver, element, color='red', background='yellow'):
-    from flask import current_app as app
+    if not SCRAPE_DEBUG:
+        return
     app.logger.info(f"Highlighting element: {element}")
+    driver.execute_script("arguments[0].scrollIntoView(true);", element)
     driver.execute_script("arguments[0].style.border='3px solid %s'; arguments[0].style.background='%s';" % (color, background), element)
 
-def get_chrome_options():
+def debug_pause(seconds=None):
+    # Visual confirmation pause, never taken outside debug mode
+    if SCRAPE_DEBUG:
+        time.sleep(SCRAPE_DEBUG_PAUSE if seconds is None else seconds)
+
+def wait_for(driver, condition, timeout=None):
+    return WebDriverWait(driver, timeout or SCRAPE_PAGE_TIMEOUT).until(condition)
+
+def accept_consent(driver):
+    # The consent banner only shows up for some regions; don't wait for it
+    buttons = driver.find_elements(By.XPATH, "//button[contains(., 'Accept')]")
+    if not buttons:
+        return
+    try:
+        buttons[0].click()
+        wait_for(driver, EC.invisibility_of_element(buttons[0]), SCRAPE_ACTION_TIMEOUT)
+    except Exception:
+        pass
+
+def get_chrome_options(lean=BROWSER_LEAN, page_load_strategy=BROWSER_PAGE_LOAD_STRATEGY):
     chrome_options = Options()
+    chrome_options.page_load_strategy = page_load_strategy
     chrome_options.add_argument('--headless=new')
     chrome_options.add_argument('--no-sandbox')
     chrome_options.add_argument('--disable-dev-shm-usage')
@@ -107,221 +248,292 @@ def get_chrome_options():
     chrome_options.add_argument('--disable-popup-blocking')
     chrome_options.add_argument('--disable-blink-features=AutomationControlled')
     chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+    if lean:
+        chrome_profile.apply_lean_options(chrome_options, disable_site_isolation=BROWSER_DISABLE_SITE_ISOLATION)
     return chrome_options
 
-def get_webdriver():
-    # Automatically download and install chromedriver that matches the installed Chrome version
-    chromedriver_autoinstaller.install()
-    chrome_options = get_chrome_options()
-    return webdriver.Chrome(options=chrome_options)
+chromedriver_path = None
+chromedriver_lock = threading.Lock()
+
+def resolve_chromedriver():
+    # Download/locate the chromedriver matching the installed Chrome once per process
+    global chromedriver_path
+    with chromedriver_lock:
+        if chromedriver_path is None:
+            chromedriver_path = chromedriver_autoinstaller.install()
+    return chromedriver_path
+
+def get_webdriver(lean=BROWSER_LEAN, page_load_strategy=BROWSER_PAGE_LOAD_STRATEGY):
+    chrome_options = get_chrome_options(lean, page_load_strategy)
+    with span('chrome_startup'):
+        driver = webdriver.Chrome(service=Service(resolve_chromedriver()), options=chrome_options)
+        if lean:
+            chrome_profile.block_requests(driver, chrome_profile.blocked_url_patterns(BROWSER_BLOCKED_URLS))
+    return driver
+
+# Shared pool of warm browsers used by every scraper in this process
+browser_pool = BrowserPool(get_webdriver, size=BROWSER_POOL_SIZE, max_uses=BROWSER_MAX_USES)
+atexit.register(browser_pool.close)
+
+def start_browser_pool():
+    try:
+        resolve_chromedriver()
+    except Exception as e:
+        print(f"[ERROR] Could not resolve chromedriver at startup: {e}")
+        return
+    if BROWSER_POOL_PREWARM:
+        threading.Thread(target=browser_pool.prewarm, name='browser-prewarm', daemon=True).start()
+
+def open_markets_page(driver, slug):
+    url = f"{CMC_SITE_URL}/currencies/{slug}/markets/"
+    with span('page_load', page='markets', source='selenium'):
+        driver.get(url)
+        wait_for(driver, EC.presence_of_element_located((By.TAG_NAME, "table")))
+    accept_consent(driver)
+
+def open_overview_page(driver, slug):
+    url = f"{CMC_SITE_URL}/currencies/{slug}/"
+    with span('page_load', page='overview', source='selenium'):
+        driver.get(url)
+        try:
+            wait_for(driver, EC.presence_of_element_located((By.XPATH, "//dl//dt")))
+        except Exception as e:
+            print("Market stats not rendered in time:", e)
+    accept_consent(driver)
 
 def get_top_dex_market_selenium(slug):
-    url = f"https://coinmarketcap.com/currencies/{slug}/markets/"
-    driver = get_webdriver()
-    driver.get(url)
-    time.sleep(5)
+    with browser_pool.driver() as driver:
+        return scrape_top_dex_market(driver, slug)
 
-    try:
-        consent_button = driver.find_element(By.XPATH, "//button[contains(., 'Accept')]")
-        consent_button.click()
-        time.sleep(1)
-    except:
-        pass
+def scrape_top_dex_market(driver, slug):
+    open_markets_page(driver, slug)
+    return read_top_dex_market(driver)
 
-    # Wait for the DEX tab to be present and click it if needed
+def read_top_dex_market(driver):
+    # Expects the markets page to be loaded; switches to the DEX tab in-page
+    # Click the DEX tab if needed and wait until it reports itself selected
+    cex_row = None
     try:
-        dex_tab = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "li[data-test='dex']"))
-        )
-        if "Tab_selected__zLjtL" not in dex_tab.get_attribute("class"):
+        dex_tab = wait_for(driver, EC.presence_of_element_located((By.CSS_SELECTOR, "li[data-test='dex']")), SCRAPE_ACTION_TIMEOUT)
+        if "Tab_selected" not in dex_tab.get_attribute("class"):
+            # A row of the CEX table still on screen; it goes stale once the DEX rows replace it
+            rows = driver.find_elements(By.CSS_SELECTOR, "table tbody tr")
+            cex_row = rows[0] if rows else None
             driver.execute_script("arguments[0].scrollIntoView(true);", dex_tab)
             dex_tab.click()
-            time.sleep(2)
+            wait_for(driver, lambda d: "Tab_selected" in dex_tab.get_attribute("class"), SCRAPE_ACTION_TIMEOUT)
     except Exception as e:
         print("DEX tab not found or could not be clicked:", e)
 
-    # Wait for the table to be present after clicking
-    WebDriverWait(driver, 10).until(
-        EC.presence_of_element_located((By.TAG_NAME, "table"))
-    )
+    # Wait for the DEX rows to be rendered. Any row would do on a fresh page, but
+    # after the CEX read the old rows are still there, so wait for them to go first;
+    # a timeout here fails the read rather than parsing CEX rows as DEX.
+    if cex_row is not None:
+        wait_for(driver, EC.staleness_of(cex_row))
+    wait_for(driver, EC.presence_of_element_located((By.CSS_SELECTOR, "table tbody tr")))
 
-    try:
-        table = driver.find_element(By.TAG_NAME, "table")
-        headers = table.find_elements(By.TAG_NAME, "th")
-        header_texts = [h.text.strip().lower() for h in headers]
-        liquidity_idx = header_texts.index("liquidity score")
-
-        # Find all DEX rows
-        rows = table.find_elements(By.TAG_NAME, "tr")[1:]
-        top_row = None
-        top_liquidity = -1
-        for row in rows:
-            cells = row.find_elements(By.TAG_NAME, "td")
-            if len(cells) < 7:
-                continue
-            try:
-                liquidity = int(cells[liquidity_idx].text.replace(',', '').replace('--', '0').strip())
-            except:
-                liquidity = 0
-            if liquidity > top_liquidity:
-                top_liquidity = liquidity
-                top_row = cells
-
-        if not top_row:
-            driver.quit()
-            return []
-
-        # Extract info from the top DEX row
-        exchange = top_row[1].text.strip()
-        pair = top_row[2].text
-        price = top_row[3].text
-        volume_24h = top_row[header_texts.index("volume (24h)")].text if "volume (24h)" in header_texts else ""
-        liquidity = top_row[liquidity_idx].text
-
-        # Get the pair link URL (the blue link)
-        link = top_row[2].find_element(By.TAG_NAME, "a")
-        pair_url = link.get_attribute("href")
-
-        # Open the pair link in a new tab using JavaScript
-        driver.execute_script(f"window.open('{pair_url}', '_blank');")
-        time.sleep(1)
-        driver.switch_to.window(driver.window_handles[-1])
-
-        # Find all info boxes in the top row (they are usually direct children of a parent div)
-        info_boxes = driver.find_elements(By.XPATH, "//div[contains(@class,'sc') and .//div[text()='Liquidity']]")
-        final_liquidity = None
-        for box in info_boxes:
-            try:
-                # Find the label
-                label = box.find_element(By.XPATH, ".//div[text()='Liquidity']")
-                # The value is usually in a sibling or following div
-                value = label.find_element(By.XPATH, "../div[contains(text(), '$')]")
-                final_liquidity = value.text.strip()
-                # Highlight for debugging
-                driver.execute_script("arguments[0].style.border='3px solid blue'; arguments[0].style.background='#e0f0ff';", value)
-                break
-            except Exception as e:
-                continue
-        # Fallback: use old method if not found
-        if not final_liquidity:
-            final_liquidity = extract_value_by_label(driver, "liquidity")
-        # Always wait 15 seconds for visual confirmation
-        time.sleep(15)
-    except Exception as e:
-        print(f"Error extracting liquidity from pair page: {e}")
-        with open("pair_page_source_failed.html", "w", encoding="utf-8") as f:
-            f.write(driver.page_source)
-        final_liquidity = None
-        time.sleep(15)
-    driver.close()  # Close the pair tab
-    driver.switch_to.window(driver.window_handles[0])  # Switch back to main tab
+    table = extract_markets_table(driver)
+    top = select_top_dex_row(table)
+    if not top:
+        return []
+    row_index, market = top
+    highlight_table_rows(driver, [row_index])
+
+    final_liquidity = None
+    if market['pair_url']:
+        final_liquidity = read_pair_liquidity(driver, market['pair_url'])
 
-    driver.quit()
     return [{
-        "exchange": exchange,
-        "pair": pair,
-        "price": price,
-        "volume_24h": volume_24h,
-        "liquidity": liquidity,
+        "exchange": market['exchange'],
+        "pair": market['pair'],
+        "price": market['price'],
+        "volume_24h": market['volume_24h'],
+        "liquidity": market['liquidity'],
         "final_liquidity": final_liquidity or 'N/A'
     }]
 
-def parse_liquidity(liquidity_str):
+def read_pair_liquidity(driver, pair_url):
+    # Pool liquidity of a DexScan pair, cached per pair URL; None if it can't be read
     try:
-        return float(liquidity_str.replace(',', '').replace('--', '0').strip())
-    except:
-        return 0
-
-def get_top_cex_markets_by_liquidity(slug, limit=3):
-    url = f"https://coinmarketcap.com/currencies/{slug}/markets/"
-    driver = get_webdriver()
-    driver.get(url)
-    time.sleep(5)
+        return pair_liquidity_cache.get_or_compute(pair_url, lambda: fetch_pair_liquidity(driver, pair_url))
+    except Exception as e:
+        print(f"Error extracting liquidity from pair page: {e}")
+        return None
 
+def fetch_pair_liquidity(driver, pair_url):
+    # The page's embedded data over plain HTTP first. Otherwise the pair page is
+    # opened in this same tab (the markets table has already been read) and the
+    # value taken with one lookup.
+    if MARKET_DATA_SOURCE != 'selenium':
+        try:
+            with span('http_pair_page', page='pair', source='http'):
+                return cmc_pages.fetch_pair_liquidity(pair_url)
+        except Exception as e:
+            print(f"[DEBUG] Pair page data unavailable over HTTP ({e}), reading it in the browser")
+    with span('page_load', page='pair', source='selenium'):
+        driver.get(pair_url)
+        try:
+            liquidity = wait_for(driver, lambda d: pair_liquidity_in_page(d, pair_url), SCRAPE_PAIR_TIMEOUT)
+        except Exception:
+            sample_page_source(driver, "pair_page_source_failed.html")
+            raise
+    debug_pause()
+    return liquidity
+
+# One round trip on the pair page: the embedded __NEXT_DATA__ JSON if there is
+# one, and the value next to the "Liquidity" label once it has rendered
+PAIR_LIQUIDITY_JS = """
+const data = document.getElementById('__NEXT_DATA__');
+const value = document.evaluate("//div[text()='Liquidity']/../div[contains(text(), '$')]", document, null,
+    XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+return {next_data: data ? data.textContent : null, text: value ? value.textContent.trim() : null, element: value};
+"""
+
+def pair_liquidity_in_page(driver, pair_url):
+    # wait_for condition: the liquidity string, or False to keep polling
+    found = driver.execute_script(PAIR_LIQUIDITY_JS)
+    if found['next_data']:
+        try:
+            liquidity = pair_liquidity_from_next_data(json.loads(found['next_data']), pair_url)
+        except ValueError:
+            liquidity = None
+        if liquidity:
+            return liquidity
+    if not found['text']:
+        return False
+    highlight_element(driver, found['element'], color='blue', background='#e0f0ff')
+    return found['text']
+
+def sample_page_source(driver, filename):
+    # Page dumps are large and slow to take; only PAGE_SOURCE_SAMPLE_RATE of failures are kept
+    if random.random() >= PAGE_SOURCE_SAMPLE_RATE:
+        return
     try:
-        consent_button = driver.find_element(By.XPATH, "//button[contains(., 'Accept')]")
-        consent_button.click()
-        time.sleep(1)
-    except:
-        pass
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(driver.page_source)
+    except Exception as e:
+        print(f"[ERROR] Could not save page source to {filename}: {e}")
+
+# Reads the whole markets table in one WebDriver round trip instead of one
+# request per row/cell: lower-cased header texts plus, for every row, each
+# cell's text and the first link inside it
+MARKETS_TABLE_JS = """
+const table = document.querySelector('table');
+if (!table) { return {headers: [], rows: []}; }
+const headers = Array.from(table.querySelectorAll('th')).map(th => th.innerText.trim().toLowerCase());
+const rows = Array.from(table.querySelectorAll('tr')).slice(1).map(tr =>
+    Array.from(tr.querySelectorAll('td')).map(td => {
+        const link = td.querySelector('a[href]');
+        return {text: td.innerText.trim(), href: link ? link.href : null};
+    })
+);
+return {headers: headers, rows: rows};
+"""
+
+def extract_markets_table(driver):
+    with span('table_extract', page='markets', source='selenium'):
+        return driver.execute_script(MARKETS_TABLE_JS) or {'headers': [], 'rows': []}
+
+def table_row_to_market(headers, cells, liquidity_idx):
+    volume_idx = headers.index("volume (24h)") if "volume (24h)" in headers else None
+    return {
+        "exchange": cells[1]['text'],
+        "pair": cells[2]['text'],
+        "pair_url": cells[2]['href'],
+        "price": cells[3]['text'],
+        "volume_24h": cells[volume_idx]['text'] if volume_idx is not None and volume_idx < len(cells) else "",
+        "liquidity": cells[liquidity_idx]['text']
+    }
 
+def select_top_dex_row(table):
+    # Returns (row_index, market) for the DEX row with the highest liquidity score
+    headers = table['headers']
+    if "liquidity score" not in headers:
+        return None
+    liquidity_idx = headers.index("liquidity score")
+    rows = [(i, cells) for i, cells in enumerate(table['rows']) if len(cells) >= 7]
+    if not rows:
+        return None
+    scores = parse_scores([cells[liquidity_idx]['text'] for _, cells in rows])
+    # First row wins a tie, as the table is already ordered by CMC
+    best = scores.index(max(scores))
+    i, cells = rows[best]
+    return i, table_row_to_market(headers, cells, liquidity_idx)
+
+def select_top_cex_markets(table, limit=3):
+    # Returns [(row_index, market)] for the top `limit` known CEX rows by liquidity score
+    headers = table['headers']
     try:
-        cex_tab = driver.find_element(By.XPATH, "//button[contains(., 'CEX')]")
-        cex_tab.click()
-        time.sleep(2)
-    except:
-        pass
+        liquidity_idx = headers.index("liquidity score")
+    except ValueError:
+        return []
 
-    table = driver.find_element(By.TAG_NAME, "table")
-    headers = table.find_elements(By.TAG_NAME, "th")
-    header_texts = [h.text.strip().lower() for h in headers]
+    indexed = [(i, table_row_to_market(headers, cells, liquidity_idx))
+               for i, cells in enumerate(table['rows']) if len(cells) >= 7]
+    return pick_top_cex_markets(indexed, limit)
 
-    try:
-        liquidity_idx = header_texts.index("liquidity score")
-    except ValueError:
-        liquidity_idx = None
-
-    cex_markets = []
-    cex_names = ["Binance", "Bybit", "Bitget", "MEXC", "Gate.io", "KuCoin", "Crypto.com Exchange", "OKX"]
-    row_elements = []  # Store row elements for highlighting
-
-    rows = table.find_elements(By.TAG_NAME, "tr")[1:]
-    for row in rows:
-        cells = row.find_elements(By.TAG_NAME, "td")
-        if len(cells) < 7 or liquidity_idx is None:
-            continue
-        exchange = cells[1].text
-        if any(cex.lower() in exchange.lower() for cex in cex_names):
-            pair = cells[2].text
-            price = cells[3].text
-            volume_24h = cells[header_texts.index("volume (24h)")].text if "volume (24h)" in header_texts else ""
-            liquidity = cells[liquidity_idx].text
-            cex_markets.append({
-                "exchange": exchange,
-                "pair": pair,
-                "price": price,
-                "volume_24h": volume_24h,
-                "liquidity": liquidity,
-                "liquidity_num": parse_liquidity(liquidity)
-            })
-            row_elements.append(row)
+def pick_top_cex_markets(indexed_markets, limit=3):
+    # [(key, market)] -> the top `limit` entries on known CEXes by liquidity score.
+    # Shared by the Selenium table reader and the HTTP market-pairs path.
+    policy = policy_store.current()
+    known = [(key, market) for key, market in indexed_markets if policy.is_known_cex(market['exchange'])]
+    scores = parse_scores([market['liquidity'] for _, market in known])
+    cex_markets = [(score, key, market) for score, (key, market) in zip(scores, known)]
 
     # Sort and get top N
-    cex_markets_with_rows = list(zip(cex_markets, row_elements))
-    cex_markets_with_rows.sort(key=lambda x: x[0]["liquidity_num"], reverse=True)
-    top_cex_markets_with_rows = cex_markets_with_rows[:limit]
-
-    # Highlight top N rows in blue
-    for _, row in top_cex_markets_with_rows:
-        highlight_element(driver, row, color='blue', background='#e0f0ff')
-        # Optionally, scroll into view
-        driver.execute_script("arguments[0].scrollIntoView(true);", row)
-        time.sleep(0.5)
-
-    # Remove helper key before returning
-    top_cex_markets = [m for m, _ in top_cex_markets_with_rows]
-    for m in top_cex_markets:
-        m.pop("liquidity_num", None)
-
-    # Wait a bit so user can see highlights before closing
-    time.sleep(3)
-    driver.quit()
+    cex_markets.sort(key=lambda x: x[0], reverse=True)
+    return [(key, market) for _, key, market in cex_markets[:limit]]
+
+def highlight_table_rows(driver, row_indexes):
+    # Debug only: looks the row elements up again just to colour them
+    if not SCRAPE_DEBUG or not row_indexes:
+        return
+    rows = driver.find_elements(By.CSS_SELECTOR, "table tr")[1:]
+    for i in row_indexes:
+        if i < len(rows):
+            highlight_element(driver, rows[i], color='blue', background='#e0f0ff')
+            debug_pause(0.5)
+
+def get_top_cex_markets_by_liquidity(slug, limit=3):
+    with browser_pool.driver() as driver:
+        return scrape_top_cex_markets(driver, slug, limit)
 
+def scrape_top_cex_markets(driver, slug, limit=3):
+    open_markets_page(driver, slug)
+    return read_top_cex_markets(driver, limit)
+
+def read_top_cex_markets(driver, limit=3):
+    # Expects the markets page to be loaded; the CEX tab is the default view
+    cex_tabs = driver.find_elements(By.XPATH, "//button[contains(., 'CEX')]")
+    if cex_tabs:
+        try:
+            cex_tabs[0].click()
+        except Exception:
+            pass
+    wait_for(driver, EC.presence_of_element_located((By.CSS_SELECTOR, "table tbody tr")))
+
+    top = select_top_cex_markets(extract_markets_table(driver), limit)
+
+    # Highlight top N rows in blue (debug mode only)
+    highlight_table_rows(driver, [i for i, _ in top])
+    # Let a watching developer see the highlights before moving on
+    debug_pause()
+
+    top_cex_markets = []
+    for _, market in top:
+        market.pop("pair_url", None)
+        top_cex_markets.append(market)
     return top_cex_markets
 
 def get_market_cap_and_volume(slug):
-    url = f"https://coinmarketcap.com/currencies/{slug}/"
-    driver = get_webdriver()
-    driver.get(url)
-    time.sleep(5)
+    with browser_pool.driver() as driver:
+        return scrape_market_cap_and_volume(driver, slug)
 
-    try:
-        consent_button = driver.find_element(By.XPATH, "//button[contains(., 'Accept')]")
-        consent_button.click()
-        time.sleep(1)
-    except:
-        pass
+def scrape_market_cap_and_volume(driver, slug):
+    open_overview_page(driver, slug)
+    return read_market_cap_and_volume(driver)
 
+def read_market_cap_and_volume(driver):
     market_cap = None
     volume_24h = None
 
@@ -341,62 +553,463 @@ def get_market_cap_and_volume(slug):
     except Exception as e:
         print("Error extracting market cap or volume:", e)
 
-    driver.quit()
     return {"market_cap": market_cap, "volume_24h": volume_24h}
 
-@app.route('/crypto/contracts/<slug>', methods=['GET'])
-def get_contract(slug):
-    headers = {
-        'Accepts': 'application/json',
-        'X-CMC_PRO_API_KEY': CMC_API_KEY
+def fetch_top_cex_markets_http(slug, limit=3):
+    with span('http_market_pairs', page='markets', source='http', center='cex'):
+        cex_pairs = cmc_pages.fetch_market_pairs(slug, 'cex')
+    top_cex_market = []
+    for _, market in pick_top_cex_markets(list(enumerate(cex_pairs)), limit):
+        market = dict(market)
+        market.pop('pair_url', None)
+        market.pop('liquidity_usd', None)
+        top_cex_market.append(market)
+    return top_cex_market
+
+def fetch_top_dex_market_http(slug):
+    with span('http_market_pairs', page='markets', source='http', center='dex'):
+        dex_pairs = cmc_pages.fetch_market_pairs(slug, 'dex')
+    if not dex_pairs:
+        return []
+    scores = parse_scores([m['liquidity'] for m in dex_pairs])
+    dex = dex_pairs[scores.index(max(scores))]
+    if not dex['liquidity_usd']:
+        raise MarketDataParseError(f"No pool liquidity for top DEX pair {dex['pair']}")
+    return [{
+        "exchange": dex['exchange'],
+        "pair": dex['pair'],
+        "price": dex['price'],
+        "volume_24h": dex['volume_24h'],
+        "liquidity": dex['liquidity'],
+        "final_liquidity": dex['liquidity_usd']
+    }]
+
+def fetch_market_stats_http(slug):
+    with span('http_overview', page='overview', source='http'):
+        return cmc_pages.fetch_overview_stats(slug)
+
+def scrape_markets(driver, slug, limit=3):
+    # One browser session for both market lists: the markets page is loaded once
+    # and read on the CEX tab then the DEX tab (plus the top DEX pair's page)
+    open_markets_page(driver, slug)
+    top_cex_market = read_top_cex_markets(driver, limit)
+    print("[DEBUG] CEX markets fetched")
+    top_dex_market = read_top_dex_market(driver)
+    print("[DEBUG] DEX markets fetched")
+    return {'top_cex_market': top_cex_market, 'top_dex_market': top_dex_market}
+
+def with_http_fallback(name, fetch_http, scrape):
+    # MARKET_DATA_SOURCE 'auto': plain HTTP first, this part alone falls back to Selenium
+    def run():
+        try:
+            return fetch_http()
+        except Exception as e:
+            print(f"[DEBUG] HTTP {name} unavailable ({e}), falling back to Selenium")
+        return scrape()
+    return run
+
+class MarketsFallback:
+    # MARKET_DATA_SOURCE 'auto' for the two market lists. Their HTTP fetches run
+    # in parallel; a part whose fetch fails waits (up to wait_timeout) for the
+    # other's outcome. When both failed they share one scrape_markets session,
+    # the markets page loaded once and both tabs read, instead of each loading
+    # the page on its own pooled browser. Otherwise the failed part scrapes alone.
+
+    def __init__(self, slug, limit=3, wait_timeout=HTTP_TIMEOUT):
+        self.slug = slug
+        self.limit = limit
+        self.wait_timeout = wait_timeout
+        self._cond = threading.Condition()
+        self._http_ok = {}  # part -> whether its HTTP fetch worked
+        self._alone = False
+        self._scrape_lock = threading.Lock()
+        self._scraped = None  # (markets, error) from the shared session
+
+    def run(self, part, other, fetch_http, scrape_alone):
+        # part/other are the snapshot keys, 'top_cex_market' and 'top_dex_market'
+        try:
+            result = fetch_http()
+        except Exception as e:
+            print(f"[DEBUG] HTTP {part} unavailable ({e}), falling back to Selenium")
+        else:
+            with self._cond:
+                self._http_ok[part] = True
+                self._cond.notify_all()
+            return result
+        with self._cond:
+            self._http_ok[part] = False
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: other in self._http_ok, self.wait_timeout)
+            shared = self._http_ok.get(other) is False and not self._alone
+            if not shared:
+                # Once one part has gone alone, the other can't count on a shared session
+                self._alone = True
+        if not shared:
+            return scrape_alone()
+        return self._shared_markets()[part]
+
+    def _shared_markets(self):
+        with self._scrape_lock:
+            if self._scraped is None:
+                try:
+                    with browser_pool.driver() as driver:
+                        self._scraped = (scrape_markets(driver, self.slug, self.limit), None)
+                except Exception as e:
+                    self._scraped = (None, e)
+        markets, error = self._scraped
+        if error is not None:
+            raise error
+        return markets
+
+def market_data_tasks(slug, limit=3):
+    # {task name: (fn, timeout)}; each fn returns the snapshot keys it fills in
+    if MARKET_DATA_SOURCE == 'selenium':
+        # Markets page (CEX + DEX + pair) and overview page on two pooled browsers
+        def markets():
+            with browser_pool.driver() as driver:
+                return scrape_markets(driver, slug, limit)
+        return {
+            'markets': (markets, SNAPSHOT_MARKETS_TIMEOUT),
+            'market_stats': (lambda: get_market_cap_and_volume(slug), SNAPSHOT_STATS_TIMEOUT)
+        }
+
+    cex = lambda: fetch_top_cex_markets_http(slug, limit)
+    dex = lambda: fetch_top_dex_market_http(slug)
+    stats = lambda: fetch_market_stats_http(slug)
+    if MARKET_DATA_SOURCE != 'http':
+        fallback = MarketsFallback(slug, limit)
+        cex_http, dex_http = cex, dex
+        cex = lambda: fallback.run('top_cex_market', 'top_dex_market', cex_http,
+                                   lambda: get_top_cex_markets_by_liquidity(slug, limit))
+        dex = lambda: fallback.run('top_dex_market', 'top_cex_market', dex_http,
+                                   lambda: get_top_dex_market_selenium(slug))
+        stats = with_http_fallback('market stats', stats, lambda: get_market_cap_and_volume(slug))
+    return {
+        'cex_markets': (lambda: {'top_cex_market': cex()}, SNAPSHOT_MARKETS_TIMEOUT),
+        'dex_market': (lambda: {'top_dex_market': dex()}, SNAPSHOT_MARKETS_TIMEOUT),
+        'market_stats': (stats, SNAPSHOT_STATS_TIMEOUT)
     }
 
-    crypto_id = get_id_from_slug(slug)
-    token_info = {}
-    if crypto_id:
-        params = {'id': crypto_id}
-        response = requests.get(CMC_INFO_URL, headers=headers, params=params)
-        info = response.json()
-        data = info['data']
-        token_info = None
-        for v in data.values():
-            if isinstance(v, list):
-                token_info = v[0]
-            elif isinstance(v, dict):
-                token_info = v
-            break
-        token_name = token_info.get('name', slug)
-    else:
-        # Fallback: use slug as token name if API fails
-        token_name = slug
-
-    top_cex_market = get_top_cex_markets_by_liquidity(slug)
-    top_dex_market = get_top_dex_market_selenium(slug)
-    market_stats = get_market_cap_and_volume(slug)
-    
-    result = {
-        'name': token_name,
+# Snapshot key each task fills in, for reporting what's missing from a partial snapshot
+TASK_FIELDS = {
+    'markets': ['top_cex_market', 'top_dex_market'],
+    'cex_markets': ['top_cex_market'],
+    'dex_market': ['top_dex_market'],
+    'market_stats': ['market_cap', 'volume_24h']
+}
+
+def fails_market_stats_gate(snapshot):
+    # The tier engine's first two checks only need market cap and volume;
+    # when they fail, the markets don't change the outcome
+    policy = policy_store.current()
+    return (parse_dollar(snapshot.get('market_cap') or '') <= policy.min_market_cap
+            or parse_dollar(snapshot.get('volume_24h') or '') <= policy.min_volume_24h)
+
+# Bounded pool the snapshot parts run on
+snapshot_fanout = FanOut(max_workers=SNAPSHOT_FANOUT_WORKERS, name='snapshot')
+
+def build_market_snapshot(slug, token_info=None):
+    tasks = market_data_tasks(slug)
+    if token_info is None:
+        tasks['cmc_info'] = (lambda: get_id_from_slug(slug), SNAPSHOT_INFO_TIMEOUT)
+
+    def decided(results):
+        return 'market_stats' in results and fails_market_stats_gate(results['market_stats'])
+
+    results, errors, skipped = snapshot_fanout.run(tasks, deadline=SNAPSHOT_DEADLINE, stop_when=decided)
+    for name, error in errors.items():
+        print(f"[ERROR] {name} for {slug} failed: {error}")
+
+    looked_up = results.pop('cmc_info', None)
+    if token_info is None:
+        token_info = looked_up
+    resolved = bool(token_info)
+    token_info = token_info or {}
+    platform = token_info.get('platform') or {}
+    snapshot = {
+        'name': token_info.get('name', slug),
         'symbol': token_info.get('symbol', slug.upper()),
-        'contract_address': token_info.get('platform', {}).get('token_address', 'N/A') if token_info else 'N/A',
-        'platform': token_info.get('platform', {}).get('name', 'N/A') if token_info else 'N/A',
-        'top_cex_market': top_cex_market,
-        'top_dex_market': top_dex_market,
-        'market_cap': market_stats['market_cap'],
-        'volume_24h': market_stats['volume_24h']
+        'contract_address': platform.get('token_address', 'N/A'),
+        'platform': platform.get('name', 'N/A'),
+        'top_cex_market': [],
+        'top_dex_market': [],
+        'market_cap': None,
+        'volume_24h': None
     }
-
-    result['investment_commitment'] = get_investment_commitment(result)
-
-    # Extract values
-    Min, Max, commitment, Investment = extract_investment_values(result['investment_commitment'])
+    for fields in results.values():
+        snapshot.update(fields)
+    missing = [field for name in errors if name in TASK_FIELDS for field in TASK_FIELDS[name]]
+    if missing:
+        snapshot['missing'] = missing
+    if skipped:
+        # Not needed: market cap/volume already rule the token out
+        snapshot['skipped'] = [field for name in skipped for field in TASK_FIELDS.get(name, [])]
+    if not resolved:
+        # The CMC lookup failed, timed out or was skipped: name and symbol are
+        # just the slug and there is no contract address
+        snapshot['unresolved'] = True
+    return snapshot
+
+# One in-flight slug pipeline (CMC lookup + scrape) per slug: concurrent requests
+# for the same slug wait on it instead of starting their own browser session
+snapshot_flights = SingleFlight()
+
+def complete_snapshot(snapshot):
+    # Partial (a part timed out), short-circuited (markets skipped once market
+    # cap/volume ruled the token out) and unresolved (no CMC metadata) snapshots
+    # answer the request that built them, but aren't stored, cached or
+    # rescored: a later caller or a new policy may need the parts they lack
+    return not snapshot.get('missing') and not snapshot.get('skipped') and not snapshot.get('unresolved')
+
+# Compiled market snapshots per slug, shared by all routes
+result_cache = ResultCache(ttl=RESULT_CACHE_TTL, stale_ttl=RESULT_CACHE_STALE_TTL,
+                           max_entries=RESULT_CACHE_MAX_ENTRIES, name='result-cache',
+                           flights=snapshot_flights, cacheable=complete_snapshot)
+
+# Pool liquidity per DEX pair URL. No stale window: a background refresh would
+# need the browser the caller has already handed back to the pool.
+pair_liquidity_cache = ResultCache(ttl=PAIR_LIQUIDITY_TTL, stale_ttl=0, max_entries=1024, name='pair-liquidity')
+
+# Scraped snapshots persisted with history
+snapshot_store = SnapshotStore(SNAPSHOT_DB, retention_days=SNAPSHOT_RETENTION_DAYS) if SNAPSHOT_DB else None
+
+def load_or_build_snapshot(slug, token_info=None):
+    # Result cache miss: reuse a fresh stored snapshot if there is one, else scrape and store it
+    if snapshot_store is not None and SNAPSHOT_FRESH_SECONDS > 0:
+        stored = snapshot_store.latest(slug, max_age=SNAPSHOT_FRESH_SECONDS)
+        if stored is not None and complete_snapshot(stored[1]):
+            print(f"[DEBUG] Using stored snapshot for {slug} from {int(time.time() - stored[0])}s ago")
+            # Cached with its scrape time, so it doesn't get a second freshness window
+            return Stored(stored[1], stored[0])
+    snapshot = build_market_snapshot(slug, token_info)
+    if snapshot_store is not None and complete_snapshot(snapshot):
+        snapshot_store.save(slug, snapshot)
+    return snapshot
+
+def warm_result_cache():
+    # Restart: put the newest stored snapshots back in the cache with their real age,
+    # so they're fresh or stale exactly as if the process had never stopped
+    if snapshot_store is None:
+        return
+    try:
+        rows = snapshot_store.latest_all(RESULT_CACHE_TTL + RESULT_CACHE_STALE_TTL, limit=RESULT_CACHE_MAX_ENTRIES)
+    except Exception as e:
+        print(f"[ERROR] Could not warm result cache from {SNAPSHOT_DB}: {e}")
+        return
+    rows = [row for row in rows if complete_snapshot(row[2])]
+    for slug, scraped_at, snapshot in reversed(rows):
+        result_cache.set(slug, snapshot, stored_at=scraped_at)
+    print(f"[DEBUG] Warmed result cache with {len(rows)} stored snapshots")
+
+warm_result_cache()
+
+def get_market_snapshot(slug, token_info=None):
+    # Copy so callers can add proposal fields without touching the cached dict
+    snapshot = result_cache.get_or_compute(slug.lower(), lambda: load_or_build_snapshot(slug, token_info))
+    return dict(snapshot)
+
+def evaluate_market_snapshot(result):
+    # Structured tier fields come straight from the engine, no re-parsing of the trace
+    policy = policy_store.current()
+    tier = tiers.evaluate(result, policy)
+    result['investment_commitment'] = tiers.render_commitment(tier, policy)
 
     # Add to JSON
-    result["Min"] = Min
-    result["Max"] = Max
-    result["commitment"] = commitment
-    result["Investment"] = Investment
+    result["Min"] = tier['Min']
+    result["Max"] = tier['Max']
+    result["commitment"] = tier['commitment']
+    result["Investment"] = tier['Investment']
+    return result
+
+# Proposal pipeline shared by every route: resolve -> scrape -> evaluate -> render.
+# Each stage takes the ctx dict and returns the keys it adds.
+
+NOT_LISTED_MARKER = 'the token i fetch doesnt exist in this following'
+
+def resolve_stage(ctx):
+    slug = ctx['slug'].lower()
+    # Callers that already looked the token up pass token_info
+    if ctx.get('token_info') is not None:
+        return {'slug': slug}
+    try:
+        token_info = get_id_from_slug(slug)
+    except Exception as e:
+        raise PipelineError(f"Could not look up '{slug}' on CoinMarketCap, please try again", status=502) from e
+    if not token_info:
+        # Neither the slug index (refreshed on a miss) nor CMC's info API knows it
+        raise PipelineError(f"No token found for slug '{slug}'", status=404)
+    return {'slug': slug, 'token_info': token_info}
+
+def scrape_stage(ctx):
+    return {'result': get_market_snapshot(ctx['slug'], ctx.get('token_info'))}
+
+def evaluate_stage(ctx):
+    return {'result': evaluate_market_snapshot(ctx['result'])}
+
+def render_stage(ctx):
+    result = ctx['result']
+    missing = result.get('missing')
+    if missing and ('market_cap' in missing or not fails_market_stats_gate(result)):
+        raise PipelineError(f"Could not fetch {', '.join(missing)} for {ctx['slug']}, please try again", status=504)
+    if NOT_LISTED_MARKER in result['investment_commitment']:
+        return {'message': result['investment_commitment'], 'outcome': 'not_listed'}
+    if not all([result['Min'], result['Max'], result['commitment'], result['Investment']]):
+        raise PipelineError("Could not extract investment values from commitment")
+    message = proposal_message_from_vars(
+        token_name=result['name'],
+        Investment=result['Investment'],
+        commitment=result['commitment'],
+        Min=result['Min'],
+        Max=result['Max'],
+        slug=ctx['slug']
+    )
+    return {'message': message, 'outcome': 'sent'}
+
+proposal_pipeline = Pipeline([
+    Stage('resolve', resolve_stage),
+    Stage('scrape', scrape_stage, timeout=PIPELINE_SCRAPE_TIMEOUT or None),
+    Stage('evaluate', evaluate_stage),
+    Stage('render', render_stage)
+], max_workers=PROPOSAL_WORKERS + BATCH_CONCURRENCY + 2, name='proposal')
+
+@app.before_request
+def start_request_trace():
+    # Reuse the caller's id when one is supplied so traces can be joined up
+    set_trace_id(request.headers.get('X-Trace-Id') or new_trace_id())
+
+@app.after_request
+def finish_request_trace(response):
+    HTTP_REQUESTS.inc(endpoint=request.endpoint or 'unknown', status=response.status_code)
+    response.headers['X-Trace-Id'] = get_trace_id() or ''
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    stats = result_cache.stats()
+    stats['pair_liquidity'] = pair_liquidity_cache.stats()
+    if snapshot_store is not None:
+        stats['snapshot_store'] = snapshot_store.stats()
+    return jsonify(stats)
+
+@app.route('/policy', methods=['GET'])
+def policy_info():
+    return jsonify({**policy_store.stats(), 'policy': policy_store.current().source})
+
+@app.route('/http/stats', methods=['GET'])
+def http_stats():
+    return jsonify({'hosts': http.stats(), 'telegram_outbox': telegram_outbox.stats()})
 
-    return jsonify(result)
+@app.route('/crypto/contracts/<slug>', methods=['GET'])
+def get_contract(slug):
+    try:
+        ctx = proposal_pipeline.run({'slug': slug}, stop_after='evaluate')
+    except PipelineError as e:
+        return jsonify({'error': str(e)}), e.status
+    return jsonify(ctx['result'])
+
+@app.route('/crypto/contracts/<slug>/history', methods=['GET'])
+def get_contract_history(slug):
+    # Stored market cap/volume/liquidity over time, newest first: ?since=<unix time>&limit=<n>
+    if snapshot_store is None:
+        return jsonify({'error': 'Snapshot history is disabled'}), 404
+    since = request.args.get('since', type=float)
+    # SQLite reads a negative LIMIT as no limit at all
+    limit = max(1, min(request.args.get('limit', 100, type=int), 1000))
+    return jsonify({'slug': slug.lower(), 'history': snapshot_store.history(slug, since=since, limit=limit)})
+
+@app.route('/crypto/rescore', methods=['POST'])
+def rescore_contracts():
+    # Re-evaluates every stored snapshot scraped within max_age seconds (default a day)
+    # against the current tier tables, without scraping
+    if snapshot_store is None:
+        return jsonify({'error': 'Snapshot history is disabled'}), 404
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    max_age = data.get('max_age', 24 * 60 * 60)
+    limit = data.get('limit', RESCORE_MAX_LIMIT)
+    # bool is an int to Python but not a count; NaN/inf fail the range check
+    if isinstance(max_age, bool) or not isinstance(max_age, (int, float)) or not 0 < max_age < float('inf'):
+        return jsonify({'error': '"max_age" must be a positive number of seconds'}), 400
+    if isinstance(limit, bool) or not isinstance(limit, int) or not 0 < limit <= RESCORE_MAX_LIMIT:
+        return jsonify({'error': f'"limit" must be an integer from 1 to {RESCORE_MAX_LIMIT}'}), 400
+    rows = snapshot_store.latest_all(max_age, limit=limit)
+    # Rows stored before short-circuited snapshots were kept out of the store
+    rows = [row for row in rows if complete_snapshot(row[2])]
+    with span('rescore', count=len(rows)):
+        policy = policy_store.current()
+        scored = [tiers.evaluate(snapshot, policy) for _, _, snapshot in rows]
+    return jsonify([{
+        'slug': slug,
+        'scraped_at': scraped_at,
+        'outcome': tier['outcome'],
+        'Min': tier['Min'],
+        'Max': tier['Max'],
+        'commitment': tier['commitment'],
+        'Investment': tier['Investment']
+    } for (slug, scraped_at, _), tier in zip(rows, scored)])
+
+@app.route('/crypto/batch', methods=['POST'])
+def get_contracts_batch():
+    # Body: {"slugs": [...]} with slugs or CoinMarketCap URLs. Streams one JSON
+    # object per line as each slug finishes, in completion order.
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object with a "slugs" list'}), 400
+    items = data.get('slugs') or data.get('urls') or []
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Expected a non-empty "slugs" list'}), 400
+    if len(items) > BATCH_MAX_SLUGS:
+        return jsonify({'error': f'At most {BATCH_MAX_SLUGS} slugs per batch'}), 400
+
+    slugs = []
+    invalid = []
+    for item in items:
+        item = str(item).strip()
+        slug = extract_slug_from_url(item) if 'coinmarketcap.com' in item else item.strip('/')
+        if not slug:
+            invalid.append(item)
+        elif slug.lower() not in slugs:
+            slugs.append(slug.lower())
+
+    token_infos = get_token_infos_by_slug(slugs)
+    unknown = []
+    if token_infos is not None:
+        unknown = [slug for slug in slugs if slug not in token_infos]
+        slugs = [slug for slug in slugs if slug in token_infos]
+    trace_id = get_trace_id()
+
+    def evaluate(slug):
+        set_trace_id(trace_id)
+        # None (bulk lookup failed) makes the resolve stage look the slug up on its own
+        token_info = token_infos.get(slug) if token_infos is not None else None
+        ctx = proposal_pipeline.run({'slug': slug, 'token_info': token_info}, stop_after='evaluate')
+        return ctx['result']
+
+    def generate():
+        for item in invalid:
+            yield json.dumps({'input': item, 'error': 'Malformed CoinMarketCap link'}) + '\n'
+        for slug in unknown:
+            yield json.dumps({'slug': slug, 'error': f"No token found for slug '{slug}'"}) + '\n'
+        executor = ThreadPoolExecutor(max_workers=max(1, BATCH_CONCURRENCY), thread_name_prefix='batch')
+        try:
+            futures = {executor.submit(evaluate, slug): slug for slug in slugs}
+            for future in as_completed(futures):
+                slug = futures[future]
+                try:
+                    line = {'slug': slug, **future.result()}
+                except Exception as e:
+                    line = {'slug': slug, 'error': str(e)}
+                yield json.dumps(line) + '\n'
+        finally:
+            # Client went away or we're done: drop anything not started yet
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 def extract_slug_from_url(url):
     match = re.search(r'coinmarketcap\.com/currencies/([^/]+)', url)
@@ -412,549 +1025,141 @@ def notify_investment_proposal():
         slug = extract_slug_from_url(url)
         if slug:
             # Initial response message
-            initial_message = "I'm on it! I'm working on generating an investment proposal based on the details provided in the link."
-            payload = {
-                'chat_id': TELEGRAM_CHAT_ID,
-                'text': initial_message
-            }
-            resp = requests.post(TELEGRAM_API_URL, json=payload)
-            print(resp.text)
+            send_telegram_message(TELEGRAM_CHAT_ID, ON_IT_MESSAGE)
             
             try:
-                # First get basic token info
-                headers = {
-                    'Accepts': 'application/json',
-                    'X-CMC_PRO_API_KEY': CMC_API_KEY
-                }
-                crypto_id = get_id_from_slug(slug)
-                if not crypto_id:
-                    error_msg = f"No token found for slug '{slug}'"
-                    send_telegram_message(TELEGRAM_CHAT_ID, error_msg)
-                    return jsonify({'error': error_msg}), 404
-
-                params = {'id': crypto_id}
-                response = requests.get(CMC_INFO_URL, headers=headers, params=params)
-                info = response.json()
-                data = info['data']
-                token_info = None
-                for v in data.values():
-                    if isinstance(v, list):
-                        token_info = v[0]
-                    elif isinstance(v, dict):
-                        token_info = v
-                    break
-                
-                # Now run Selenium operations
-                print("Starting Selenium operations...")
-                top_cex_market = get_top_cex_markets_by_liquidity(slug)
-                print("CEX markets fetched")
-                top_dex_market = get_top_dex_market_selenium(slug)
-                print("DEX markets fetched")
-                market_stats = get_market_cap_and_volume(slug)
-                print("Market stats fetched")
-                
-                # Compile results
-                result = {
-                    'name': token_info['name'],
-                    'symbol': token_info['symbol'],
-                    'contract_address': token_info.get('platform', {}).get('token_address', 'N/A'),
-                    'platform': token_info.get('platform', {}).get('name', 'N/A'),
-                    'top_cex_market': top_cex_market,
-                    'top_dex_market': top_dex_market,
-                    'market_cap': market_stats['market_cap'],
-                    'volume_24h': market_stats['volume_24h']
-                }
-
-                # Get investment commitment
-                result['investment_commitment'] = get_investment_commitment(result)
-                print("[DEBUG] Investment commitment calculated")
-
-                if 'the token i fetch doesnt exist in this following' in result['investment_commitment']:
-                    send_telegram_message(TELEGRAM_CHAT_ID, result['investment_commitment'])
-                    return jsonify({'ok': True})
-
-                # Try to get values from JSON first
-                Min = result.get("Min")
-                Max = result.get("Max")
-                commitment = result.get("commitment")
-                Investment = result.get("Investment")
-
-                # Fallback to parsing if any are missing
-                if not all([Min, Max, commitment, Investment]):
-                    Min, Max, commitment, Investment = extract_investment_values(result['investment_commitment'])
-
-                if not all([Min, Max, commitment, Investment]):
-                    error_msg = "Could not extract investment values from commitment"
-                    send_telegram_message(TELEGRAM_CHAT_ID, error_msg)
-                    return jsonify({'error': error_msg}), 500
-
-                # Generate and send the formatted proposal message
-                proposal_token_name = token_name  # token_name is set to API name or slug above
-
-                formatted_message = proposal_message_from_vars(
-                    token_name=proposal_token_name,
-                    Investment=Investment,
-                    commitment=commitment,
-                    Min=Min,
-                    Max=Max,
-                    slug=slug
-                )
-                
+                ctx = proposal_pipeline.run({'slug': slug})
                 print("[DEBUG] Sending formatted proposal...")
-                send_telegram_message(TELEGRAM_CHAT_ID, formatted_message)
+                send_telegram_message(TELEGRAM_CHAT_ID, ctx['message'])
+                PROPOSALS.inc(route='notify', outcome=ctx['outcome'])
+                if ctx['outcome'] == 'not_listed':
+                    return jsonify({'ok': True})
                 print("[DEBUG] Proposal sent successfully")
-                
                 return jsonify({'status': 'success', 'message': 'Notification and proposal sent to Telegram.'})
-                    
+
+            except PipelineError as e:
+                PROPOSALS.inc(route='notify', outcome='rejected')
+                send_telegram_message(TELEGRAM_CHAT_ID, str(e))
+                return jsonify({'error': str(e)}), e.status
             except Exception as e:
+                PROPOSALS.inc(route='notify', outcome='error')
                 error_message = f"Failed to generate proposal: {str(e)}"
                 print(f"Error: {error_message}")
                 send_telegram_message(TELEGRAM_CHAT_ID, error_message)
                 return jsonify({'status': 'error', 'message': error_message}), 500
-                
+
     return jsonify({'status': 'ignored', 'message': 'URL does not match CoinMarketCap pattern.'}), 400
 
-# Add this after the imports
-def create_telegram_session():
-    session = requests.Session()
-    retry_strategy = Retry(
-        total=3,  # number of retries
-        backoff_factor=1,  # wait 1, 2, 4 seconds between retries
-        status_forcelist=[500, 502, 503, 504]  # HTTP status codes to retry on
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount("https://", adapter)
-    session.mount("http://", adapter)
-    return session
-
-# Create a persistent session for Telegram
-telegram_session = create_telegram_session()
-
-# Helper to send Telegram message
-def send_telegram_message(chat_id, text, max_retries=3):
-    payload = {
-        'chat_id': chat_id,
-        'text': text,
-        'parse_mode': 'HTML',
-        'disable_web_page_preview': False
-    }
-    
-    for attempt in range(max_retries):
-        try:
-            # Use the persistent session with retry logic
-            resp = telegram_session.post(TELEGRAM_API_URL, data=payload, timeout=10)
-            resp.raise_for_status()  # Raise an exception for bad status codes
-            print(f"[DEBUG] Telegram API response: {resp.text}")
-            return True
-        except requests.exceptions.RequestException as e:
-            print(f"[DEBUG] Attempt {attempt + 1}/{max_retries} failed to send Telegram message: {str(e)}")
-            if attempt < max_retries - 1:
-                # Wait before retrying (exponential backoff)
-                wait_time = (2 ** attempt) * 1  # 1, 2, 4 seconds
-                print(f"[DEBUG] Waiting {wait_time} seconds before retry...")
-                time.sleep(wait_time)
-            else:
-                print(f"[ERROR] Failed to send Telegram message after {max_retries} attempts: {str(e)}")
-                # Try one last time with a fresh session
-                try:
-                    fresh_session = create_telegram_session()
-                    resp = fresh_session.post(TELEGRAM_API_URL, data=payload, timeout=10)
-                    resp.raise_for_status()
-                    print("[DEBUG] Successfully sent message with fresh session")
-                    return True
-                except Exception as final_e:
-                    print(f"[ERROR] Final attempt failed: {str(final_e)}")
-                    return False
-    return False
+# Helper to send Telegram message. Only queues it; the outbox does the sending.
+def send_telegram_message(chat_id, text):
+    return telegram_outbox.send(chat_id, text)
+
+# Progress message for one proposal: the first call sends it, later calls with
+# the same key edit that message instead of sending another one
+def send_telegram_status(chat_id, status_key, text):
+    return telegram_outbox.status(chat_id, status_key, text)
 
 @app.route('/webhook', methods=['POST'])
 def telegram_webhook():
-    global last_processed_message_id_per_chat, last_message_time_per_chat, spam_attempts_per_chat, chat_locks
     data = request.get_json()
     message = data.get('message', {})
     chat_id = message.get('chat', {}).get('id')
     text = message.get('text', '')
     message_id = message.get('message_id')
-    current_time = datetime.now()
-
-    # Ensure per-chat lock exists
-    if chat_id not in chat_locks:
-        chat_locks[chat_id] = threading.Lock()
-
-    with chat_locks[chat_id]:
-        # Check if user is currently blocked
-        if chat_id in spam_attempts_per_chat:
-            last_spam_time = spam_attempts_per_chat[chat_id].get('block_until')
-            if last_spam_time and current_time < last_spam_time:
-                send_telegram_message(chat_id, f"please don't spam me 🥺 please wait for {BLOCK_DURATION}secs")
-                return jsonify({'ok': True})
-            elif last_spam_time and current_time >= last_spam_time:
-                # Block just expired, send friendly message
-                send_telegram_message(chat_id, "you can chat me again with another link now 😊 but please dont spam me again i get dizzy 😵‍💫")
-                # Remove block
-                del spam_attempts_per_chat[chat_id]
-
-        last_time = last_message_time_per_chat.get(chat_id)
-        # If message is within cooldown, set block immediately and return
-        if last_time and (current_time - last_time) < timedelta(seconds=COOLDOWN_SECONDS):
-            # Set block for BLOCK_DURATION seconds IMMEDIATELY and return
-            block_until = current_time + timedelta(seconds=BLOCK_DURATION)
-            spam_attempts_per_chat[chat_id] = {'block_until': block_until}
-            last_message_time_per_chat[chat_id] = current_time  # update to prevent further races
+    update_id = data.get('update_id')
+
+    if not chat_id:
+        print("[DEBUG] Update without a chat, skipping.")
+        return jsonify({'ok': True})
+
+    # Telegram redelivers an update until it gets a 200; handle each one once
+    dedupe_key = f"update:{update_id}" if update_id is not None else f"message:{chat_id}:{message_id}"
+    if chat_state.seen(dedupe_key):
+        print("[DEBUG] Duplicate update, skipping.")
+        return jsonify({'ok': True})
+
+    with chat_state.lock(chat_id):
+        admission = chat_state.admit(chat_id)
+        if admission in (BLOCKED, THROTTLED):
             send_telegram_message(chat_id, f"please don't spam me 🥺 please wait for {BLOCK_DURATION}secs")
             return jsonify({'ok': True})
-        # If not in cooldown, set last_message_time_per_chat right away to prevent race
-        last_message_time_per_chat[chat_id] = current_time
-
-        if chat_id:
-            # Extract CMC URL from message
-            cmc_url_match = CMC_URL_REGEX.search(text)
-            if not cmc_url_match:
-                # Not a CoinMarketCap link
-                send_telegram_message(chat_id, "Oh no you send a wrong link try it again it should be related to coinmarketcap link")
-                return jsonify({'ok': True})
-            # Only process if this message_id is new for this chat
-            if last_processed_message_id_per_chat.get(chat_id) == message_id:
-                print("[DEBUG] Duplicate message, skipping.")
-                return jsonify({'ok': True})
-            last_processed_message_id_per_chat[chat_id] = message_id
-
-            print("[DEBUG] CMC URL detected, sending reply...")
-            
-            # Send initial response
-            send_telegram_message(chat_id, "I'm on it! I'm working on generating an investment proposal based on the details provided in the link.")
-            
-            try:
-                # Extract slug from URL
-                slug = extract_slug_from_url(text)
-                if not slug:
-                    send_telegram_message(chat_id, "your link structure was wrong try again")
-                    return jsonify({'error': 'Malformed CoinMarketCap link'}), 400
-                    
-                print(f"[DEBUG] Processing token: {slug}")
-                
-                # Get basic token info
-                headers = {
-                    'Accepts': 'application/json',
-                    'X-CMC_PRO_API_KEY': CMC_API_KEY
-                }
-                crypto_id = get_id_from_slug(slug)
-                token_info = {}
-                if crypto_id:
-                    params = {'id': crypto_id}
-                    response = requests.get(CMC_INFO_URL, headers=headers, params=params)
-                    info = response.json()
-                    data = info['data']
-                    token_info = None
-                    for v in data.values():
-                        if isinstance(v, list):
-                            token_info = v[0]
-                        elif isinstance(v, dict):
-                            token_info = v
-                        break
-                    token_name = token_info.get('name', slug)
-                else:
-                    # Fallback: use slug as token name if API fails
-                    token_name = slug
-
-                # Proceed with Selenium and market scraping regardless
-                print("[DEBUG] Starting Selenium operations...")
-                send_telegram_message(chat_id, "Fetching market data...")
-                
-                top_cex_market = get_top_cex_markets_by_liquidity(slug)
-                print("[DEBUG] CEX markets fetched")
-                
-                top_dex_market = get_top_dex_market_selenium(slug)
-                print("[DEBUG] DEX markets fetched")
-                
-                market_stats = get_market_cap_and_volume(slug)
-                print("[DEBUG] Market stats fetched")
-                
-                # Compile results
-                result = {
-                    'name': token_name,
-                    'symbol': token_info.get('symbol', slug.upper()),
-                    'contract_address': token_info.get('platform', {}).get('token_address', 'N/A') if token_info else 'N/A',
-                    'platform': token_info.get('platform', {}).get('name', 'N/A') if token_info else 'N/A',
-                    'top_cex_market': top_cex_market,
-                    'top_dex_market': top_dex_market,
-                    'market_cap': market_stats['market_cap'],
-                    'volume_24h': market_stats['volume_24h']
-                }
-
-                # Get investment commitment
-                result['investment_commitment'] = get_investment_commitment(result)
-                print("[DEBUG] Investment commitment calculated")
-
-                if 'the token i fetch doesnt exist in this following' in result['investment_commitment']:
-                    send_telegram_message(TELEGRAM_CHAT_ID, result['investment_commitment'])
-                    return jsonify({'ok': True})
+        if admission == UNBLOCKED:
+            # Block just expired, send friendly message
+            send_telegram_message(chat_id, "you can chat me again with another link now 😊 but please dont spam me again i get dizzy 😵‍💫")
+
+        # Extract CMC URL from message
+        cmc_url_match = CMC_URL_REGEX.search(text)
+        if not cmc_url_match:
+            # Not a CoinMarketCap link
+            send_telegram_message(chat_id, "Oh no you send a wrong link try it again it should be related to coinmarketcap link")
+            return jsonify({'ok': True})
 
-                # Try to get values from JSON first
-                Min = result.get("Min")
-                Max = result.get("Max")
-                commitment = result.get("commitment")
-                Investment = result.get("Investment")
-
-                # Fallback to parsing if any are missing
-                if not all([Min, Max, commitment, Investment]):
-                    Min, Max, commitment, Investment = extract_investment_values(result['investment_commitment'])
-
-                if not all([Min, Max, commitment, Investment]):
-                    error_msg = "Could not extract investment values from commitment"
-                    send_telegram_message(TELEGRAM_CHAT_ID, error_msg)
-                    return jsonify({'error': error_msg}), 500
-
-                # Generate and send the formatted proposal message
-                proposal_token_name = token_name  # token_name is set to API name or slug above
-
-                formatted_message = proposal_message_from_vars(
-                    token_name=proposal_token_name,
-                    Investment=Investment,
-                    commitment=commitment,
-                    Min=Min,
-                    Max=Max,
-                    slug=slug
-                )
-                
-                print("[DEBUG] Sending formatted proposal...")
-                send_telegram_message(TELEGRAM_CHAT_ID, formatted_message)
-                print("[DEBUG] Proposal sent successfully")
-                
-                # After sending the proposal, return immediately
-                return jsonify({'ok': True})
-                    
-            except Exception as e:
-                error_message = f"Failed to generate proposal: {str(e)}"
-                print(f"[DEBUG] Error: {error_message}")
-                send_telegram_message(TELEGRAM_CHAT_ID, error_message)
-                return jsonify({'error': error_message}), 500
-            
-        print("[DEBUG] No valid CMC URL or duplicate message.")
-        return jsonify({'ok': True})
+        # Extract slug from URL
+        slug = extract_slug_from_url(text)
+        if not slug:
+            send_telegram_message(chat_id, "your link structure was wrong try again")
+            return jsonify({'ok': True})
 
-@app.route('/webhook', methods=['GET'])
-def webhook_get():
-    return 'Webhook endpoint is live!'
+        # Hand the slow part to the worker pool and answer Telegram straight away,
+        # otherwise it times out and redelivers the update
+        status_key = f"{chat_id}:{message_id}"
+        job = {'chat_id': chat_id, 'slug': slug, 'message_id': message_id, 'status_key': status_key, 'trace_id': get_trace_id()}
+        if not proposal_jobs.submit(job):
+            send_telegram_message(chat_id, "I'm working on a lot of links right now 😵‍💫 please send yours again in a minute")
+            return jsonify({'ok': True})
 
-def extract_value_by_label(driver, label_text):
-    try:
-        # Wait for the <dl> element to appear
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.TAG_NAME, "dl"))
-        )
-        dls = driver.find_elements(By.TAG_NAME, "dl")
-        for dl in dls:
-            dts = dl.find_elements(By.TAG_NAME, "dt")
-            dds = dl.find_elements(By.TAG_NAME, "dd")
-            for dt, dd in zip(dts, dds):
-                label = dt.text.strip().lower()
-                value = dd.text.strip()
-                if label_text.lower() in label:
-                    return value
-        # Fallback: try to find any element with text "Liquidity" and get the next sibling
-        all_elements = driver.find_elements(By.XPATH, "//*[contains(text(), 'Liquidity')]")
-        for el in all_elements:
-            try:
-                # Try to get the next sibling
-                value = el.find_element(By.XPATH, "following-sibling::*[1]").text.strip()
-                if value:
-                    return value
-            except:
-                continue
-    except Exception as e:
-        print(f"Error extracting {label_text}: {e}")
-    return None
+        print(f"[DEBUG] CMC URL detected, queued {slug} (queue depth {proposal_jobs.depth()})")
+        send_telegram_status(chat_id, status_key, ON_IT_MESSAGE)
+        return jsonify({'ok': True})
 
-def parse_dollar(val):
-    if not val:
-        return 0
-    # Use regex to extract the first number (with optional decimal and T/B/M/K)
-    match = re.search(r"([\d,.]+)\s*([TBMK]?)", val.replace('$','').replace('\n',' '))
-    if not match:
-        return 0
-    num, suffix = match.groups()
-    num = num.replace(',', '')
+def process_proposal_job(job):
+    # Runs on a proposal worker thread, outside the request and the per-chat lock
+    chat_id = job['chat_id']
+    slug = job['slug']
+    set_trace_id(job.get('trace_id') or new_trace_id())
     try:
-        value = float(num)
-    except:
-        return 0
-    if suffix == 'T':
-        value *= 1_000_000_000_000
-    elif suffix == 'B':
-        value *= 1_000_000_000
-    elif suffix == 'M':
-        value *= 1_000_000
-    elif suffix == 'K':
-        value *= 1_000
-    return int(value)
-
-def get_investment_commitment(result):
-    trace = []
-    def parse_dollar(val):
-        if not val:
-            return 0
-        match = re.search(r"([\d,.]+)\s*([TBMK]?)", val.replace('$','').replace('\n',' '))
-        if not match:
-            return 0
-        num, suffix = match.groups()
-        num = num.replace(',', '')
-        try:
-            value = float(num)
-        except:
-            return 0
-        if suffix == 'T':
-            value *= 1_000_000_000_000
-        elif suffix == 'B':
-            value *= 1_000_000_000
-        elif suffix == 'M':
-            value *= 1_000_000
-        elif suffix == 'K':
-            value *= 1_000
-        return int(value)
-
-    # 1. Market cap > $1m?
-    market_cap_val = parse_dollar(result.get('market_cap', ''))
-    trace.append(f"Market cap: {market_cap_val} (raw: {result.get('market_cap', '')})")
-    if market_cap_val <= 1_000_000:
-        trace.append("Market cap is less than $1M. Skipping.")
-        return " -> ".join(trace)
-
-    # 2. 24h Volume > 150k?
-    volume_24h_val = parse_dollar(result.get('volume_24h', ''))
-    trace.append(f"24h Volume: {volume_24h_val} (raw: {result.get('volume_24h', '')})")
-    if volume_24h_val <= 150_000:
-        trace.append("24h volume is less than $150K. Skipping.")
-        return " -> ".join(trace)
-
-    # 3. Listed on T1/T2 CEX?
-    t1 = ["Binance", "Coinbase", "OKX", "Bybit", "Gate", "KuCoin", "Kraken"]
-    t2 = ["BitMart", "MEXC", "Bitget", "LBank", "Coinstore", "CoinEx", "HTX", "Weex"]
-    cex_markets = result.get('top_cex_market', [])
-    cex_markets_t1_t2 = [c for c in cex_markets if any(t in c['exchange'] for t in t1 + t2)]
-    trace.append(f"does cex exist? {'yes' if cex_markets_t1_t2 else 'no'}")
-    if not cex_markets_t1_t2:
-        return ("the token i fetch doesnt exist in this following\n"
-                "Tier 1: Binance, Coinbase, OKX, Bybit, Gate, KuCoin, Kraken\n"
-                "Tier 2: BitMart, MEXC, Bitget, LBank, Coinstore, CoinEx,HTX,Weex\n\n"
-                "try again with another token")
-
-    # If DEX exists, use DEX logic only
-    dex_markets = result.get('top_dex_market', [])
-    trace.append(f"does dex exist? {'yes' if dex_markets and len(dex_markets) > 0 else 'no'}")
-    if dex_markets and len(dex_markets) > 0:
-        dex = dex_markets[0]
-        dex_liquidity = parse_dollar(dex.get('final_liquidity') or dex.get('liquidity'))
-        trace.append(f"DEX Liquidity: {dex_liquidity} (raw: {dex.get('final_liquidity') or dex.get('liquidity')})")
-        if dex_liquidity < 25_000:
-            trace.append(f"DEX liquidity is less than $25K. Skipping. (Liquidity: {dex_liquidity})")
-            return " -> ".join(trace)
-        elif 25_000 < dex_liquidity <= 50_000:
-            trace.append("DEX liquidity 25K-50K. Daily transaction 500 - 1K minimum commitment 250K investment 350K")
-            return " -> ".join(trace)
-        elif 50_000 < dex_liquidity <= 100_000:
-            trace.append("DEX liquidity 50K-100K. Daily transaction 1K - 2.5K minimum commitment 350K investment 500K")
-            return " -> ".join(trace)
-        elif 100_000 < dex_liquidity <= 250_000:
-            trace.append("DEX liquidity 100K-250K. Daily transaction 2.5K - 5K minimum commitment 500K investment 600K")
-            return " -> ".join(trace)
-        elif 250_000 < dex_liquidity <= 1_000_000:
-            trace.append("DEX liquidity 250K-1M. Daily transaction 5K - 10K minimum commitment 600K investment 800K")
-            return " -> ".join(trace)
-        elif 1_000_000 < dex_liquidity <= 3_000_000:
-            trace.append("DEX liquidity 1M-3M. Daily transaction 10K - 25K minimum commitment 800K investment 1M")
-            return " -> ".join(trace)
-        elif dex_liquidity > 3_000_000:
-            trace.append("DEX liquidity >3M. Daily transaction 25K - 40K minimum commitment 1M investment 3M")
-            return " -> ".join(trace)
-        trace.append("No suitable investment found.")
-        return " -> ".join(trace)
-    # If no DEX, use CEX logic only
-    cex = max(cex_markets_t1_t2, key=lambda x: int(x.get('liquidity', '0').replace(',', '')))
-    cex_vol = parse_dollar(result.get('volume_24h', ''))
-    cex_liq = int(cex.get('liquidity', '0').replace(',', ''))
-    trace.append(f"CEX Volume: {cex_vol}, CEX Liquidity: {cex_liq}")
-    if cex_vol < 150_000 and 1 <= cex_liq <= 150:
-        trace.append("CEX volume < 150K and liquidity score 1-150. Skipping.")
-        return " -> ".join(trace)
-    elif cex_vol > 150_000 and 150 < cex_liq <= 250:
-        trace.append("CEX volume >150K and liquidity score 150-250. Skipping.")
-        return " -> ".join(trace)
-    elif 150_000 < cex_vol <= 250_000 and 250 < cex_liq <= 350:
-        trace.append("CEX volume 150K-250K and liquidity score 250-350. Daily transaction 500 - 1K minimum commitment 250K investment 350K")
-        return " -> ".join(trace)
-    elif 250_000 < cex_vol <= 500_000 and 350 < cex_liq <= 450:
-        trace.append("CEX volume 250K-500K and liquidity score 350-450. Daily transaction 1K - 2.5K minimum commitment 350K investment 500K")
-        return " -> ".join(trace)
-    elif 500_000 < cex_vol and 450 < cex_liq <= 550:
-        trace.append("CEX volume >500K and liquidity score 450-550. Daily transaction 2.5K - 5K minimum commitment 500K investment 600K")
-        return " -> ".join(trace)
-    elif 1_000_000 < cex_vol and 550 < cex_liq <= 600:
-        trace.append("CEX volume >1M and liquidity score 550-600. Daily transaction 5K - 10K minimum commitment 600K investment 800K")
-        return " -> ".join(trace)
-    elif 3_000_000 < cex_vol and cex_liq > 600:
-        trace.append("CEX volume >3M and liquidity score >600. Daily transaction 10K - 25K minimum commitment 800K investment 1M")
-        return " -> ".join(trace)
-    trace.append("No suitable investment found.")
-    return " -> ".join(trace)
-
-def format_proposal(token_name, dex_trace):
-    # Example: "DEX liquidity >3M. Daily transaction 25K - 40K minimum commitment 1M investment 3M"
-    import re
-    # Extract daily transaction and commitment/investment
-    daily_txn = re.search(r"Daily transaction ([\d\.K]+) - ([\d\.K]+)", dex_trace)
-    min_commit = re.search(r"minimum commitment ([\d\.MK]+)", dex_trace)
-    invest = re.search(r"investment ([\d\.MK]+)", dex_trace)
-    if not (daily_txn and min_commit and invest):
-        return dex_trace  # fallback to raw trace if parsing fails
-
-    min_daily = daily_txn.group(1)
-    max_daily = daily_txn.group(2)
-    min_commitment = min_commit.group(1)
-    investment = invest.group(1)
+        log_event('proposal_start', slug=slug, chat_id=chat_id, queued=proposal_jobs.depth())
 
-    return f'''📄 PROPOSAL FORMAT:
-Investment Proposal - {token_name}
-Investment: ${investment}
-Minimum commitment: ${min_commitment}
-Discount: 22%
-Trial period: 2 weeks.
-Investment will be made in daily transactions of ${min_daily} total per day, then
-increase to ${min_daily} - ${max_daily} per day after trial period. Price will be determined using the current,
-daily market price at the time of transaction/ event.
-✅ Meet our team, review testimonials & explore our value proposition VIEW OFFER HERE
-(https://abrasive-alphabet-c84.notion.site/VICTUS-GLOBAL-{token_name}-customstring?pvs=4)
-• Strategic business partnership support
-• $1B+ Network Ecosystem
-• Marketing & Elite KOL Exposure
-• Connect with our CEXs partners for fast listings & discounts
-• Test our professional MM service (with a limited-time 7-day free trial)
-• Smart contract & Security audits
-• Full-Cycle Support
-Market-Making Service – 7-Day Trial
-To ensure strong market positioning from the start, we provide a complimentary 7-day trial of our
-professional market-making service. This includes enhanced liquidity management, optimized
-order book depth, and improved trading efficiency to maximize your asset's market
-performance.
-Join 80+ other portfolio companies in the Victus Global network, including Pepecoin, Netmind,
-Brett, Unizen, Dynex, and many more.
-🔹Learn more with our Deck (https://docsend.com/view/rz6cwzaem4qj2ihi)
-🔹Visit our Website (https://www.victusglobal.com/)
-🔹Follow us on X (https://x.com/VictusGlobal_)
-'''
+        # Proceed with Selenium and market scraping regardless
+        print("[DEBUG] Starting Selenium operations...")
+        send_telegram_status(chat_id, job['status_key'], f"{ON_IT_MESSAGE}\n\nFetching market data...")
+
+        ctx = proposal_pipeline.run({'slug': slug})
+        print("[DEBUG] Sending formatted proposal...")
+        send_telegram_message(TELEGRAM_CHAT_ID, ctx['message'])
+        print("[DEBUG] Proposal sent successfully")
+        PROPOSALS.inc(route='webhook', outcome=ctx['outcome'])
+
+    except PipelineError as e:
+        PROPOSALS.inc(route='webhook', outcome='rejected')
+        send_telegram_message(TELEGRAM_CHAT_ID, str(e))
+    except Exception as e:
+        PROPOSALS.inc(route='webhook', outcome='error')
+        error_message = f"Failed to generate proposal: {str(e)}"
+        print(f"[DEBUG] Error: {error_message}")
+        send_telegram_message(TELEGRAM_CHAT_ID, error_message)
+
+# Worker pool that runs /webhook proposals in the background
+proposal_jobs = JobQueue(process_proposal_job, workers=PROPOSAL_WORKERS, max_depth=PROPOSAL_QUEUE_SIZE, name='proposal')
+proposal_jobs.start()
+
+# Prometheus metrics served on /metrics; stage timings come from metrics.span()
+HTTP_REQUESTS = REGISTRY.counter('victus_http_requests_total', 'Requests handled by this app')
+PROPOSALS = REGISTRY.counter('victus_proposals_total', 'Proposals by route and outcome')
+REGISTRY.callback('victus_proposal_queue_depth', 'Proposal jobs waiting for a worker', proposal_jobs.depth)
+REGISTRY.callback('victus_proposal_workers_busy', 'Proposal workers currently running a job', proposal_jobs.active)
+REGISTRY.callback('victus_browsers_live', 'Chrome instances alive in the browser pool', lambda: browser_pool.stats()['live'])
+REGISTRY.callback('victus_browsers_idle', 'Chrome instances idle in the browser pool', lambda: browser_pool.stats()['idle'])
+REGISTRY.callback('victus_telegram_outbox_pending', 'Telegram messages waiting to be sent', telegram_outbox.depth)
+REGISTRY.callback('victus_chat_states', 'Chats with rate-limit/dedupe state in memory', lambda: len(chat_state))
+REGISTRY.callback('victus_slug_index_size', 'Slugs in the CMC map index', lambda: len(slug_index))
+REGISTRY.callback('victus_result_cache_lookups_total', 'Market snapshot cache lookups by result',
+                  lambda: [({'result': k}, result_cache.stats()[k]) for k in ('hits', 'stale_hits', 'misses')],
+                  metric_type='counter')
 
-def extract_investment_values(investment_commitment):
-    import re
-    daily_txn = re.search(r"Daily transaction ([\d\.K]+) - ([\d\.K]+)", investment_commitment)
-    min_commit = re.search(r"minimum commitment ([\d\.MK]+)", investment_commitment)
-    invest = re.search(r"investment ([\d\.MK]+)", investment_commitment)
-    if daily_txn and min_commit and invest:
-        Min = daily_txn.group(1)
-        Max = daily_txn.group(2)
-        commitment = min_commit.group(1)
-        Investment = invest.group(1)
-        return Min, Max, commitment, Investment
-    return None, None, None, None
+@app.route('/webhook', methods=['GET'])
+def webhook_get():
+    return 'Webhook endpoint is live!'
 
 def proposal_message_from_vars(token_name, Investment, commitment, Min, Max, slug):
     token_link = f"https://coinmarketcap.com/currencies/{slug}/"
@@ -1002,11 +1207,7 @@ https://x.com/VictusGlobal_
 {token_link}
 '''
 
-def is_special_slug(slug):
-    return slug in [
-        "bubblemaps", "zerolend", "green-metaverse-token", "aleo",
-        "ice-decentralized-future", "taiko", "frax", "manta-network", "fluence-network"
-    ]
+start_browser_pool()
 
 if __name__ == '__main__':
     # Use environment variable for port if available
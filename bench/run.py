@@ -0,0 +1,295 @@
+import argparse
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+# Offline benchmarks for the proposal pipeline.
+#
+#   python bench/run.py                       # micro benchmarks + full /webhook flow
+#   python bench/run.py --only micro -n 20000
+#   python bench/run.py --only flow --source selenium -n 20 --concurrency 2
+#   python bench/run.py --only pages -n 20    # needs Chrome
+#
+# Micro benchmarks time the pure functions on every proposal (dollar parsing,
+# tier evaluation, message rendering, slug lookup), and the
+# numparse column parsers against the per-cell parsers they replaced. The flow
+# benchmark posts Telegram updates to /webhook through Flask's test client with
+# CMC, the CMC pages and Telegram all served by bench/stub_servers.py, and times
+# each update until its proposal reaches the Telegram stub. With --source
+# selenium the pages are loaded by the app's own headless Chrome pool.
+# The pages benchmark loads the stub markets, overview and pair pages in one
+# Chrome with the full profile and one with the lean profile (chrome_profile.py)
+# and prints each browser's load times and resident memory afterwards. The stub
+# pages carry --page-assets images and fonts plus ad/analytics scripts so there
+# is something to block.
+# Each benchmark reports throughput and p50/p95/p99 latency.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numparse
+from stub_servers import StubServer
+
+SAMPLE_SNAPSHOT = {
+    'name': 'Bubblemaps',
+    'symbol': 'BMT',
+    'market_cap': '$71,241,774',
+    'volume_24h': '$8,942,391',
+    'top_cex_market': [
+        {'exchange': 'Binance', 'pair': 'BMT/USDT', 'price': '$0.0713', 'volume_24h': '$3,120,450', 'liquidity': '612'},
+        {'exchange': 'Bybit', 'pair': 'BMT/USDT', 'price': '$0.0711', 'volume_24h': '$1,210,030', 'liquidity': '538'}
+    ],
+    'top_dex_market': [
+        {'exchange': 'Raydium', 'pair': 'BMT/SOL', 'price': '$0.0714', 'volume_24h': '$420,510',
+         'liquidity': '402', 'final_liquidity': '$312,450'}
+    ]
+}
+DOLLAR_SAMPLES = ['$71,241,774', '$8.94M', '$1.2B', '$312,450', '$0.0714', '--', '$3,120,450*', '']
+# One markets table worth of cells: 200 pairs, volume and liquidity score columns
+VOLUME_COLUMN = [f"${(i * 7919) % 5_000_000:,}" if i % 9 else '--' for i in range(200)]
+SCORE_COLUMN = [str((i * 37) % 700) if i % 6 else '--' for i in range(200)]
+
+
+def legacy_parse_dollar(val):
+    # The parser numparse replaced, kept as the baseline
+    if not val:
+        return 0
+    match = re.search(r"([\d,.]+)\s*([TBMK]?)", val.replace('$', '').replace('\n', ' '))
+    if not match:
+        return 0
+    num, suffix = match.groups()
+    try:
+        value = float(num.replace(',', ''))
+    except ValueError:
+        return 0
+    return int(value * {'T': 1_000_000_000_000, 'B': 1_000_000_000, 'M': 1_000_000, 'K': 1_000}.get(suffix, 1))
+
+
+def legacy_parse_liquidity(liquidity_str):
+    try:
+        return float(liquidity_str.replace(',', '').replace('--', '0').strip())
+    except:
+        return 0
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def report(name, latencies, wall, errors=0, unit='us'):
+    scale = 1e6 if unit == 'us' else 1e3
+    values = sorted(v * scale for v in latencies)
+    ops = len(latencies) / wall if wall > 0 else 0.0
+    print(f"{name:<34} n={len(latencies):<7} {ops:>12,.1f} ops/s   "
+          f"p50={percentile(values, 50):>10,.1f}{unit}  p95={percentile(values, 95):>10,.1f}{unit}  "
+          f"p99={percentile(values, 99):>10,.1f}{unit}" + (f"  errors={errors}" if errors else ''))
+
+
+def bench(name, fn, iterations, unit='us'):
+    # fn takes the iteration number so samples can be rotated
+    latencies = []
+    clock = time.perf_counter
+    start = clock()
+    for i in range(iterations):
+        t0 = clock()
+        fn(i)
+        latencies.append(clock() - t0)
+    report(name, latencies, clock() - start, unit=unit)
+
+
+def process_tree_rss(pid):
+    # Summed VmRSS (bytes) of pid and all its descendants, from /proc (Linux only)
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            continue
+    return total
+
+
+def run_micro(app, iterations, stub):
+    # Warm the slug index from the stub map first so lookups are pure dict probes
+    app.slug_index.refresh(wait=True)
+    slugs = stub.slugs + ['no-such-token']
+    bench('parse_dollar', lambda i: app.parse_dollar(DOLLAR_SAMPLES[i % len(DOLLAR_SAMPLES)]), iterations)
+    bench('legacy parse_dollar', lambda i: legacy_parse_dollar(DOLLAR_SAMPLES[i % len(DOLLAR_SAMPLES)]), iterations)
+    columns = max(10, iterations // 200)
+    bench('numparse.parse_dollars (x200)', lambda i: numparse.parse_dollars(VOLUME_COLUMN), columns)
+    bench('legacy parse_dollar (x200)', lambda i: [legacy_parse_dollar(v) for v in VOLUME_COLUMN], columns)
+    bench('numparse.parse_scores (x200)', lambda i: numparse.parse_scores(SCORE_COLUMN), columns)
+    bench('legacy parse_liquidity (x200)', lambda i: [legacy_parse_liquidity(v) for v in SCORE_COLUMN], columns)
+    bench('evaluate_market_snapshot', lambda i: app.evaluate_market_snapshot(dict(SAMPLE_SNAPSHOT)), iterations)
+    batch = [SAMPLE_SNAPSHOT] * 1000
+    bench('tiers.evaluate (x1000)', lambda i: [app.tiers.evaluate(s) for s in batch], max(10, iterations // 1000))
+    bench('proposal_message_from_vars',
+          lambda i: app.proposal_message_from_vars('Bubblemaps', '800K', '600K', '5K', '10K', 'bubblemaps'),
+          iterations)
+    bench('slug_index.get', lambda i: app.slug_index.get(slugs[i % len(slugs)]), iterations)
+
+
+def run_pages(app, stub, iterations):
+    # Same pages, one fresh browser per profile: 'full' is the profile the app used
+    # before chrome_profile.py (everything loads, driver.get waits for onload)
+    slug = stub.slugs[0]
+    pair_url = f"{stub.base_url}/dexscan/solana/BMTpoolAddr111/"
+
+    def load_pair(driver):
+        driver.get(pair_url)
+        app.wait_for(driver, lambda d: app.pair_liquidity_in_page(d, pair_url), app.SCRAPE_PAIR_TIMEOUT)
+
+    pages = [
+        ('markets', lambda driver: app.open_markets_page(driver, slug)),
+        ('overview', lambda driver: app.open_overview_page(driver, slug)),
+        ('pair', load_pair)
+    ]
+    for profile, lean, strategy in (('full', False, 'normal'), ('lean', True, 'eager')):
+        driver = app.get_webdriver(lean=lean, page_load_strategy=strategy)
+        try:
+            for page, load in pages:
+                bench(f"page {page} ({profile})", lambda i: load(driver), iterations, unit='ms')
+            if os.path.isdir('/proc'):
+                rss = process_tree_rss(driver.service.process.pid)
+                print(f"{'browser rss (' + profile + ')':<34} {rss / 1024 / 1024:,.1f} MB")
+        finally:
+            driver.quit()
+
+
+def run_flow(app, stub, requests_count, concurrency, timeout):
+    # Closed loop: each client thread posts one update and waits for its proposal
+    # before posting the next. Every update uses its own chat and slug, so neither
+    # the per-chat cooldown nor the snapshot cache/single-flight hides any work.
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(requests_count))
+
+    def client():
+        test_client = app.app.test_client()
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            slug = stub.slugs[i % len(stub.slugs)]
+            token_link = f"https://coinmarketcap.com/currencies/{slug}/"
+            update = {'update_id': 10_000 + i, 'message': {
+                'message_id': i + 1,
+                'chat': {'id': 500_000 + i},
+                'text': token_link
+            }}
+            t0 = time.perf_counter()
+            resp = test_client.post('/webhook', json=update)
+            done_at = None
+            if resp.status_code == 200:
+                done_at = stub.wait_for_message(
+                    lambda method, fields: method == 'sendMessage'
+                    and 'PROPOSAL FORMAT' in fields.get('text', '') and token_link in fields.get('text', ''),
+                    timeout)
+            with lock:
+                if done_at is None:
+                    errors[0] += 1
+                else:
+                    latencies.append(done_at - t0)
+
+    threads = [threading.Thread(target=client, name=f"bench-client-{n}") for n in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    report(f"webhook flow ({app.MARKET_DATA_SOURCE})", latencies, time.perf_counter() - start, errors[0], unit='ms')
+
+
+def configure_env(stub, args, workdir):
+    # Must run before app is imported: the app reads its config at import time
+    os.environ.update({
+        'CMC_PRO_API_BASE': stub.base_url,
+        'CMC_SITE_URL': stub.base_url,
+        'CMC_DATA_API_URL': f"{stub.base_url}/data-api",
+        'TELEGRAM_API_ROOT': stub.base_url,
+        'TELEGRAM_BOT_TOKEN': 'bench:token',
+        'TELEGRAM_CHAT_ID': '1',
+        # Proposals all go to TELEGRAM_CHAT_ID; don't let the per-chat send limit set the pace
+        'TELEGRAM_CHAT_INTERVAL': '0',
+        'TELEGRAM_GLOBAL_RATE': '10000',
+        'CMC_MAP_SNAPSHOT_PATH': os.path.join(workdir, 'cmc_map_snapshot.json'),
+        'RESULT_CACHE_TTL': '0',
+        'RESULT_CACHE_STALE_TTL': '0',
+        'PAIR_LIQUIDITY_TTL': '0',
+        'SNAPSHOT_DB': os.path.join(workdir, 'snapshots.sqlite3'),
+        'SNAPSHOT_FRESH_SECONDS': '0',
+        'MARKET_DATA_SOURCE': args.source,
+        'BROWSER_POOL_SIZE': str(args.concurrency),
+        'PROPOSAL_WORKERS': str(args.concurrency),
+        'PROPOSAL_QUEUE_SIZE': str(max(20, args.concurrency * 2)),
+        # Prewarmed explicitly below, and only when the flow actually uses Chrome
+        'BROWSER_POOL_PREWARM': '0'
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks for the proposal pipeline')
+    parser.add_argument('--only', choices=['all', 'micro', 'flow', 'pages'], default='all')
+    parser.add_argument('-n', '--iterations', type=int, default=None,
+                        help='calls per micro benchmark (default 10000), updates for the flow (default 50) '
+                             'or loads per page (default 20)')
+    parser.add_argument('--source', choices=['http', 'selenium', 'auto'], default='http',
+                        help='MARKET_DATA_SOURCE for the flow benchmark')
+    parser.add_argument('--concurrency', type=int, default=2, help='flow client threads, workers and browsers')
+    parser.add_argument('--stub-latency-ms', type=float, default=0, help='delay added to every stub response')
+    parser.add_argument('--timeout', type=float, default=60, help='seconds to wait for each proposal')
+    parser.add_argument('--page-assets', type=int, default=12,
+                        help='images and fonts added to every stub HTML page (with ad/analytics scripts)')
+    args = parser.parse_args()
+
+    flow_requests = args.iterations or 50
+    stub = StubServer(slug_count=max(100, flow_requests), latency_ms=args.stub_latency_ms,
+                      page_assets=args.page_assets).start()
+    workdir = tempfile.mkdtemp(prefix='victus-bench-')
+    configure_env(stub, args, workdir)
+
+    import app
+
+    print(f"Stubs on {stub.base_url}")
+    if args.only in ('all', 'micro'):
+        run_micro(app, args.iterations or 10_000, stub)
+    if args.only in ('all', 'flow'):
+        if args.source != 'http':
+            # Don't count Chrome startup against the first requests
+            app.browser_pool.prewarm()
+        run_flow(app, stub, flow_requests, args.concurrency, args.timeout)
+        print(f"Telegram stub calls: {len(stub.messages)}, outbox: {app.telegram_outbox.stats()}")
+    if args.only == 'pages':
+        run_pages(app, stub, args.iterations or 20)
+    stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+import json
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# One local HTTP server standing in for everything the app talks to, so the
+# whole /webhook flow can be benchmarked offline:
+#   CMC Pro API      /v1/cryptocurrency/map, /v2/cryptocurrency/info
+#   CMC data API     /data-api/v3/cryptocurrency/market-pairs/latest
+#   CMC site pages   /currencies/<slug>/markets/, /currencies/<slug>/, /dexscan/...
+#   Telegram Bot API /bot<token>/sendMessage, /bot<token>/editMessageText
+# Every slug serves the same saved fixtures; Telegram calls are recorded so the
+# benchmark can see when a proposal has been delivered.
+#
+# With page_assets > 0 every HTML page also pulls in that many images and
+# fonts plus ad/analytics scripts and an ad iframe, like the real pages do.
+# Third-party requests go to /ext/<host>/..., so host-based blocking rules
+# (e.g. "*googletagmanager.com/*") match them as they would the real hosts.
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures')
+BOT_RE = re.compile(r'^/bot[^/]+/(\w+)$')
+
+
+TRACKER_SCRIPTS = ('www.googletagmanager.com/gtm.js', 'www.google-analytics.com/analytics.js',
+                   'securepubads.g.doubleclick.net/tag/js/gpt.js', 'static.hotjar.com/c/hotjar.js')
+# Stand-in for analytics code: some parsing and a few MB of live objects
+TRACKER_JS = b"window.__bench = (window.__bench || []).concat(Array.from({length: 100000}, (_, i) => ({i: i, s: 'x' + i})));"
+
+
+def _read_fixture(*parts):
+    with open(os.path.join(FIXTURES_DIR, *parts), 'rb') as f:
+        return f.read()
+
+
+def _png(width, height):
+    # A real (decodable) image, so a browser that loads it also pays for the decoded bitmap
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    rows = b''.join(b'\x00' + bytes((x * 7 + y * 3) % 256 for x in range(width * 3)) for y in range(height))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows, 6)) + chunk(b'IEND', b''))
+
+
+def _asset_block(count):
+    parts = ['<style>']
+    parts += [f"@font-face {{ font-family: bench{i}; src: url(/assets/font-{i}.woff2) format('woff2'); }}"
+              f" .bench-font-{i} {{ font-family: bench{i}; }}" for i in range(count)]
+    parts.append('</style><div>')
+    parts += [f'<img src="/assets/img-{i}.png" width="320" height="240"><span class="bench-font-{i}">.</span>'
+              for i in range(count)]
+    parts.append('</div>')
+    parts += [f'<script src="/ext/{path}"></script>' for path in TRACKER_SCRIPTS]
+    parts.append('<iframe src="/ext/googleads.g.doubleclick.net/pagead/ads.html" width="300" height="250"></iframe>')
+    return '\n'.join(parts).encode('utf-8')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real hosts
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type='application/json'):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode('utf-8')
+        if self.server.stub.latency:
+            time.sleep(self.server.stub.latency)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        stub = self.server.stub
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        path = url.path
+
+        if path == '/v1/cryptocurrency/map':
+            return self._send(200, {'data': stub.coins()})
+        if path == '/v2/cryptocurrency/info':
+            slugs = (query.get('slug') or [''])[0].split(',')
+            return self._send(200, {'data': stub.infos(slugs)})
+        if path == '/data-api/v3/cryptocurrency/market-pairs/latest':
+            center_type = (query.get('centerType') or ['cex'])[0]
+            if center_type not in ('cex', 'dex'):
+                return self._send(400, {'status': {'error_message': 'bad centerType'}})
+            return self._send(200, stub.pages[f'pairs_{center_type}'])
+        if path.startswith('/currencies/') and path.endswith('/markets/'):
+            return self._send(200, stub.pages['markets'], 'text/html; charset=utf-8')
+        if path.startswith('/currencies/'):
+            # The coin node has to carry the requested slug, or the page reader won't take its numbers
+            slug = path.split('/')[2].encode('utf-8')
+            page = stub.pages['overview'].replace(b'"slug": "bubblemaps"', b'"slug": "' + slug + b'"')
+            return self._send(200, page, 'text/html; charset=utf-8')
+        if path.startswith('/dexscan/'):
+            return self._send(200, stub.pages['pair'], 'text/html; charset=utf-8')
+        if path.startswith('/assets/img-'):
+            return self._send(200, stub.assets['png'], 'image/png')
+        if path.startswith('/assets/font-'):
+            return self._send(200, stub.assets['font'], 'font/woff2')
+        if path.startswith('/ext/') and path.endswith('.js'):
+            return self._send(200, TRACKER_JS, 'application/javascript')
+        if path.startswith('/ext/') and path.endswith('.html'):
+            return self._send(200, stub.assets['ad'], 'text/html; charset=utf-8')
+        return self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        match = BOT_RE.match(urlsplit(self.path).path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8')
+        if not match:
+            return self._send(404, {'ok': False, 'description': 'Not Found'})
+        fields = {k: v[0] for k, v in parse_qs(body).items()}
+        message_id = self.server.stub.record(match.group(1), fields)
+        return self._send(200, {'ok': True, 'result': {'message_id': message_id}})
+
+
+class StubServer:
+    def __init__(self, slug_count=100, slug_prefix='bench-token', host='127.0.0.1', port=0, latency_ms=0,
+                 page_assets=0):
+        self.slugs = [f"{slug_prefix}-{i}" for i in range(slug_count)]
+        self.latency = latency_ms / 1000
+        self.pages = {
+            'markets': _read_fixture('site', 'bubblemaps_markets.html'),
+            'pair': _read_fixture('site', 'pair.html'),
+            'overview': _read_fixture('cmc', 'bubblemaps_overview.html'),
+            'pairs_cex': _read_fixture('cmc', 'bubblemaps_pairs_cex.json'),
+            'pairs_dex': _read_fixture('cmc', 'bubblemaps_pairs_dex.json')
+        }
+        self.assets = {
+            'png': _png(640, 480),
+            'font': os.urandom(64 * 1024),
+            'ad': b'<html><body>' + b''.join(b'<img src="/assets/img-ad-%d.png">' % i for i in range(4))
+                  + b'</body></html>'
+        }
+        if page_assets:
+            block = _asset_block(page_assets)
+            for name in ('markets', 'pair', 'overview'):
+                self.pages[name] = self.pages[name].replace(b'</body>', block + b'\n</body>')
+        self.messages = []  # (received_at, method, fields)
+        self._next_message_id = 1
+        self._cond = threading.Condition()
+        self._server = ThreadingHTTPServer((host, port), StubHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='bench-stubs', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def coins(self):
+        return [{
+            'id': 900000 + i,
+            'rank': 1000 + i,
+            'name': f"Bench Token {i}",
+            'symbol': f"BT{i}",
+            'slug': slug,
+            'is_active': 1,
+            'platform': {'name': 'Solana', 'token_address': f"BenchTokenAddr{i}"}
+        } for i, slug in enumerate(self.slugs)]
+
+    def infos(self, slugs):
+        known = {coin['slug']: coin for coin in self.coins()}
+        return {str(known[s]['id']): known[s] for s in slugs if s in known}
+
+    def record(self, method, fields):
+        with self._cond:
+            message_id = self._next_message_id
+            self._next_message_id += 1
+            self.messages.append((time.perf_counter(), method, fields))
+            self._cond.notify_all()
+        return message_id
+
+    def wait_for_message(self, predicate, timeout=60):
+        # Returns the perf_counter time the first matching message arrived, or None
+        deadline = time.perf_counter() + timeout
+        seen = 0
+        with self._cond:
+            while True:
+                for received_at, method, fields in self.messages[seen:]:
+                    if predicate(method, fields):
+                        return received_at
+                seen = len(self.messages)
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+
+if __name__ == '__main__':
+    # Serve the stubs on a fixed port for poking at by hand: python bench/stub_servers.py 8765
+    import sys
+    server = StubServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8765).start()
+    print(f"Stub CMC/Telegram server on {server.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
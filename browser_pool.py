@@ -0,0 +1,149 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class BrowserPoolExhausted(Exception):
+    pass
+
+
+class _PooledBrowser:
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+
+
+class BrowserPool:
+    # Bounded pool of warm WebDriver instances shared by all scrapers in the
+    # process. Browsers are checked out for one job, reset (extra tabs closed,
+    # cookies cleared) when checked back in, and replaced after max_uses jobs
+    # or as soon as they stop responding.
+
+    def __init__(self, create_driver, size=2, max_uses=50, checkout_timeout=120):
+        self._create_driver = create_driver
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self.checkout_timeout = checkout_timeout
+        # LIFO so the most recently used (hottest) browser is handed out first
+        self._idle = []
+        # Signalled whenever a browser is checked in or a slot is freed, so a
+        # waiting checkout can take either
+        self._cond = threading.Condition()
+        self._live = 0
+        self._closed = False
+
+    def _reserve_slot(self):
+        with self._cond:
+            if self._closed:
+                raise BrowserPoolExhausted("Browser pool is closed")
+            if self._live < self.size:
+                self._live += 1
+                return True
+        return False
+
+    def _release_slot(self):
+        with self._cond:
+            self._live -= 1
+            self._cond.notify()
+
+    def _new_browser(self):
+        try:
+            return _PooledBrowser(self._create_driver())
+        except Exception:
+            self._release_slot()
+            raise
+
+    def checkout(self, timeout=None):
+        timeout = timeout or self.checkout_timeout
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise BrowserPoolExhausted("Browser pool is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._live < self.size:
+                    self._live += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise BrowserPoolExhausted(f"No browser available after {timeout}s")
+                self._cond.wait(remaining)
+        return self._new_browser()
+
+    def _put_idle(self, browser):
+        with self._cond:
+            self._idle.append(browser)
+            self._cond.notify()
+
+    def checkin(self, browser, healthy=True):
+        browser.uses += 1
+        if self._closed or not healthy or browser.uses >= self.max_uses or not self._reset(browser.driver):
+            self._discard(browser)
+            return
+        self._put_idle(browser)
+
+    def _reset(self, driver):
+        # Leave the browser as a clean single blank tab for the next job
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.delete_all_cookies()
+            driver.get('about:blank')
+            return True
+        except Exception as e:
+            print(f"[DEBUG] Browser reset failed, recycling: {e}")
+            return False
+
+    def _discard(self, browser):
+        try:
+            browser.driver.quit()
+        except Exception:
+            pass
+        self._release_slot()
+
+    @contextmanager
+    def driver(self, timeout=None):
+        browser = self.checkout(timeout)
+        healthy = True
+        try:
+            yield browser.driver
+        except Exception:
+            healthy = self._is_alive(browser.driver)
+            raise
+        finally:
+            self.checkin(browser, healthy=healthy)
+
+    def _is_alive(self, driver):
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def prewarm(self):
+        # Start browsers up to the pool size so the first jobs skip Chrome cold starts
+        started = []
+        while self._reserve_slot():
+            try:
+                started.append(self._new_browser())
+            except Exception as e:
+                print(f"[ERROR] Could not prewarm browser: {e}")
+                break
+        for browser in started:
+            self._put_idle(browser)
+
+    def stats(self):
+        with self._cond:
+            return {'size': self.size, 'live': self._live, 'idle': len(self._idle)}
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for browser in idle:
+            self._discard(browser)
@@ -0,0 +1,259 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# admit() outcomes
+ADMITTED = 'admitted'
+UNBLOCKED = 'unblocked'  # admitted, and a spam block has just run out
+BLOCKED = 'blocked'  # still inside a spam block
+THROTTLED = 'throttled'  # over the rate limit, block starts now
+
+
+def take_token(tokens, refilled_at, block_until, now, rate, burst, block_duration):
+    # One spam check against a chat's bucket. Returns the outcome and the
+    # chat's new (tokens, refilled_at, block_until).
+    unblocked = False
+    if block_until:
+        if now < block_until:
+            return BLOCKED, tokens, refilled_at, block_until
+        block_until = 0
+        unblocked = True
+    tokens = min(burst, tokens + (now - refilled_at) * rate)
+    if tokens >= 1:
+        return (UNBLOCKED if unblocked else ADMITTED), tokens - 1, now, 0
+    return THROTTLED, tokens, now, now + block_duration
+
+
+class _ChatEntry:
+    __slots__ = ('lock', 'tokens', 'refilled_at', 'block_until', 'touched_at')
+
+    def __init__(self, burst, now):
+        self.lock = threading.Lock()
+        self.tokens = burst
+        self.refilled_at = now
+        self.block_until = 0
+        self.touched_at = now
+
+
+class ChatStateStore:
+    # Per-chat webhook state: the chat's lock, a token bucket for the spam
+    # check and any active spam block, plus the set of Telegram updates
+    # already handled. Chats idle for ttl seconds are dropped and at most
+    # max_chats are kept (least recently seen go first), so memory stays
+    # bounded however many chats write to the bot. Every operation is O(1)
+    # amortized.
+    #
+    # The bucket holds up to `burst` messages and refills at `rate` per
+    # second; a message that finds it empty blocks the chat for
+    # block_duration seconds.
+
+    def __init__(self, rate, burst=1, block_duration=10, ttl=3600, max_chats=10000, max_updates=10000):
+        self.rate = rate
+        self.burst = burst
+        self.block_duration = block_duration
+        self.ttl = max(ttl, block_duration)
+        self.max_chats = max_chats
+        self.max_updates = max_updates
+        self._chats = OrderedDict()  # chat_id -> _ChatEntry, least recently seen first
+        self._updates = OrderedDict()  # dedupe key -> first seen at
+        self._lock = threading.Lock()
+        self.evicted = 0
+        self.duplicates = 0
+
+    def _entry(self, chat_id, now):
+        # Called with self._lock held
+        entry = self._chats.get(chat_id)
+        if entry is None:
+            entry = self._chats[chat_id] = _ChatEntry(self.burst, now)
+            self._evict(now)
+        else:
+            self._chats.move_to_end(chat_id)
+        entry.touched_at = now
+        return entry
+
+    def _evict(self, now):
+        # Oldest entries sit at the front, so this stops at the first live one.
+        # A chat whose lock is held is mid-request and is never dropped.
+        for _ in range(len(self._chats)):
+            chat_id, entry = next(iter(self._chats.items()))
+            if now - entry.touched_at < self.ttl and len(self._chats) <= self.max_chats:
+                break
+            if entry.lock.locked():
+                self._chats.move_to_end(chat_id)
+                continue
+            del self._chats[chat_id]
+            self.evicted += 1
+
+    def lock(self, chat_id):
+        # Created under the store lock, so two requests for a new chat always
+        # get the same lock
+        now = time.monotonic()
+        with self._lock:
+            return self._entry(chat_id, now).lock
+
+    def admit(self, chat_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entry(chat_id, now)
+            outcome, entry.tokens, entry.refilled_at, entry.block_until = take_token(
+                entry.tokens, entry.refilled_at, entry.block_until, now, self.rate, self.burst, self.block_duration)
+            return outcome
+
+    def seen(self, key):
+        # True if key was already recorded within ttl; otherwise records it
+        now = time.monotonic()
+        with self._lock:
+            seen_at = self._updates.get(key)
+            if seen_at is not None and now - seen_at < self.ttl:
+                self.duplicates += 1
+                return True
+            self._updates[key] = now
+            self._updates.move_to_end(key)
+            while self._updates:
+                oldest_key, oldest_at = next(iter(self._updates.items()))
+                if now - oldest_at < self.ttl and len(self._updates) <= self.max_updates:
+                    break
+                del self._updates[oldest_key]
+            return False
+
+    def __len__(self):
+        return len(self._chats)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'chats': len(self._chats),
+                'updates': len(self._updates),
+                'evicted': self.evicted,
+                'duplicates': self.duplicates
+            }
+
+
+class SqliteChatStateStore:
+    # Same interface as ChatStateStore, kept in a SQLite database (WAL mode)
+    # that every gunicorn worker on the host opens. admit() and seen() each run
+    # as one BEGIN IMMEDIATE transaction, so a check-and-set is atomic across
+    # processes: a redelivered update or a spam burst spread over several
+    # workers is still handled once. Expired rows are pruned every
+    # prune_every writes.
+    #
+    # lock() is only an in-process lock; cross-worker correctness comes from
+    # the transactions, not from holding it.
+
+    def __init__(self, path, rate, burst=1, block_duration=10, ttl=3600, max_chats=10000, max_updates=10000,
+                 prune_every=256, busy_timeout=5):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self.block_duration = block_duration
+        self.ttl = max(ttl, block_duration)
+        self.max_chats = max_chats
+        self.max_updates = max_updates
+        self.prune_every = prune_every
+        self.busy_timeout = busy_timeout
+        self._locks = ChatStateStore(rate, burst, block_duration, ttl, max_chats, max_updates)
+        self._local = threading.local()
+        self._writes = 0
+        self.duplicates = 0
+        with self._transaction() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS chat_state (chat_id TEXT PRIMARY KEY, tokens REAL, "
+                       "refilled_at REAL, block_until REAL, touched_at REAL)")
+            db.execute("CREATE INDEX IF NOT EXISTS chat_state_touched ON chat_state (touched_at)")
+            db.execute("CREATE TABLE IF NOT EXISTS seen_updates (key TEXT PRIMARY KEY, seen_at REAL)")
+            db.execute("CREATE INDEX IF NOT EXISTS seen_updates_seen ON seen_updates (seen_at)")
+
+    def _connection(self):
+        # One connection per thread; autocommit mode so transactions are explicit
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+    def lock(self, chat_id):
+        return self._locks.lock(chat_id)
+
+    def admit(self, chat_id):
+        # Wall clock, not monotonic: the timestamps are shared between processes
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT tokens, refilled_at, block_until FROM chat_state WHERE chat_id = ?",
+                             (str(chat_id),)).fetchone()
+            tokens, refilled_at, block_until = row if row else (self.burst, now, 0)
+            outcome, tokens, refilled_at, block_until = take_token(
+                tokens, refilled_at, block_until, now, self.rate, self.burst, self.block_duration)
+            db.execute("INSERT OR REPLACE INTO chat_state (chat_id, tokens, refilled_at, block_until, touched_at) "
+                       "VALUES (?, ?, ?, ?, ?)", (str(chat_id), tokens, refilled_at, block_until, now))
+        self._maybe_prune()
+        return outcome
+
+    def seen(self, key):
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("DELETE FROM seen_updates WHERE key = ? AND seen_at < ?", (key, now - self.ttl))
+            inserted = db.execute("INSERT OR IGNORE INTO seen_updates (key, seen_at) VALUES (?, ?)",
+                                  (key, now)).rowcount
+        if not inserted:
+            self.duplicates += 1
+            return True
+        self._maybe_prune()
+        return False
+
+    def _maybe_prune(self):
+        self._writes += 1
+        if self._writes % self.prune_every:
+            return
+        cutoff = time.time() - self.ttl
+        try:
+            with self._transaction() as db:
+                db.execute("DELETE FROM chat_state WHERE touched_at < ? AND block_until < ?", (cutoff, time.time()))
+                db.execute("DELETE FROM chat_state WHERE chat_id IN (SELECT chat_id FROM chat_state "
+                           "ORDER BY touched_at DESC LIMIT -1 OFFSET ?)", (self.max_chats,))
+                db.execute("DELETE FROM seen_updates WHERE seen_at < ?", (cutoff,))
+                db.execute("DELETE FROM seen_updates WHERE key IN (SELECT key FROM seen_updates "
+                           "ORDER BY seen_at DESC LIMIT -1 OFFSET ?)", (self.max_updates,))
+        except sqlite3.Error as e:
+            print(f"[ERROR] Pruning chat state failed: {e}")
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM chat_state").fetchone()[0]
+
+    def stats(self):
+        db = self._connection()
+        return {
+            'backend': 'sqlite',
+            'chats': db.execute("SELECT COUNT(*) FROM chat_state").fetchone()[0],
+            'updates': db.execute("SELECT COUNT(*) FROM seen_updates").fetchone()[0],
+            'duplicates': self.duplicates
+        }
+
+
+class _Transaction:
+    # BEGIN IMMEDIATE takes the write lock up front, so the read and the write
+    # in a check-and-set can't interleave with another process
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def create_chat_state_store(backend, path, **kwargs):
+    # backend is 'memory' (per process) or 'sqlite' (shared by every worker on the host)
+    if backend == 'sqlite':
+        return SqliteChatStateStore(path, **kwargs)
+    if backend != 'memory':
+        print(f"[ERROR] Unknown chat state backend {backend!r}, using memory")
+    return ChatStateStore(**kwargs)
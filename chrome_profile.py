@@ -0,0 +1,81 @@
+# Lean Chrome profile for scraping. The scrapers only read DOM text and
+# embedded JSON, so images, fonts, media and third-party ad/analytics
+# requests are blocked before they are sent (CDP Network.setBlockedURLs, plus
+# the image content setting so nothing is decoded), Chrome's background
+# services are switched off, and driver.get() can return at DOMContentLoaded
+# ('eager') because every scraper waits for the elements it reads anyway.
+
+IMAGE_EXTENSIONS = ('png', 'jpg', 'jpeg', 'gif', 'webp', 'avif', 'svg', 'ico', 'bmp')
+FONT_EXTENSIONS = ('woff', 'woff2', 'ttf', 'otf', 'eot')
+MEDIA_EXTENSIONS = ('mp4', 'webm', 'mp3', 'ogg', 'm3u8')
+
+TRACKER_HOSTS = (
+    'googletagmanager.com', 'google-analytics.com', 'doubleclick.net', 'googlesyndication.com',
+    'googleadservices.com', 'adservice.google.com', 'connect.facebook.net', 'analytics.twitter.com',
+    'static.ads-twitter.com', 'ads.linkedin.com', 'bat.bing.com', 'clarity.ms', 'hotjar.com',
+    'segment.io', 'segment.com', 'amplitude.com', 'mixpanel.com', 'intercom.io', 'criteo.com',
+    'taboola.com', 'outbrain.com', 'adsrvr.org', 'scorecardresearch.com', 'quantserve.com'
+)
+
+
+def blocked_url_patterns(extra=()):
+    # Network.setBlockedURLs wildcard patterns; extension patterns also cover query strings
+    patterns = []
+    for ext in IMAGE_EXTENSIONS + FONT_EXTENSIONS + MEDIA_EXTENSIONS:
+        patterns += [f"*.{ext}", f"*.{ext}?*"]
+    patterns += [f"*{host}/*" for host in TRACKER_HOSTS]
+    return patterns + [p for p in extra if p]
+
+
+LEAN_ARGUMENTS = (
+    '--blink-settings=imagesEnabled=false',
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--disable-translate',
+    '--disable-breakpad',
+    '--disable-domain-reliability',
+    '--disable-client-side-phishing-detection',
+    '--metrics-recording-only',
+    '--mute-audio',
+    '--no-first-run',
+    '--no-default-browser-check',
+)
+
+# Passed as one --disable-features; Chrome only reads the last one given
+LEAN_DISABLED_FEATURES = ('Translate', 'OptimizationHints', 'MediaRouter', 'AutofillServerCommunication',
+                          'InterestFeedContentSuggestions')
+
+# Site isolation stays on: the browser runs third-party page JavaScript and
+# already has --no-sandbox. Turning it off saves a renderer process per
+# cross-site frame; measure with `bench/run.py --only pages` before opting in.
+SITE_ISOLATION_FEATURES = ('IsolateOrigins', 'site-per-process')
+
+LEAN_PREFS = {
+    'profile.managed_default_content_settings.images': 2,
+    'profile.default_content_setting_values.notifications': 2,
+    'profile.managed_default_content_settings.geolocation': 2,
+    'profile.managed_default_content_settings.media_stream': 2,
+}
+
+
+def apply_lean_options(chrome_options, disable_site_isolation=False):
+    for argument in LEAN_ARGUMENTS:
+        chrome_options.add_argument(argument)
+    features = LEAN_DISABLED_FEATURES
+    if disable_site_isolation:
+        features += SITE_ISOLATION_FEATURES
+        chrome_options.add_argument('--disable-site-isolation-trials')
+    chrome_options.add_argument('--disable-features=' + ','.join(features))
+    chrome_options.add_experimental_option('prefs', LEAN_PREFS)
+    return chrome_options
+
+
+def block_requests(driver, patterns):
+    # Applies to the driver's tab for every later navigation
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(patterns)})
+    except Exception as e:
+        print(f"[ERROR] Could not set up request blocking: {e}")
@@ -0,0 +1,90 @@
+import threading
+import time
+
+
+class _PendingLookup:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class CMCClient:
+    # Thin client for the CoinMarketCap Pro API over the shared HttpClient.
+    # Metadata is resolved by slug directly, and single-slug lookups that arrive
+    # within batch_window seconds of each other are merged into one
+    # comma-separated /v2/cryptocurrency/info call.
+
+    def __init__(self, http, api_key, info_url, map_url, batch_window=0.05, batch_size=100, timeout=30):
+        self.http = http
+        self.api_key = api_key
+        self.info_url = info_url
+        self.map_url = map_url
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._pending = {}
+        self._batch_scheduled = False
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _get(self, url, params, timeout=None):
+        headers = {'Accepts': 'application/json', 'X-CMC_PRO_API_KEY': self.api_key}
+        self.calls += 1
+        response = self.http.get(url, headers=headers, params=params, timeout=timeout or self.timeout)
+        return response.json()
+
+    def fetch_map(self):
+        data = self._get(self.map_url, {'listing_status': 'active'}, timeout=60)
+        if 'data' not in data:
+            print("Error from CMC map API:", data.get('status'))
+            return None
+        return data['data']
+
+    def info_by_slugs(self, slugs):
+        # Returns {slug: token_info}; slugs CMC doesn't know are simply absent
+        infos = {}
+        slugs = [s.lower() for s in slugs if s]
+        for i in range(0, len(slugs), self.batch_size):
+            chunk = slugs[i:i + self.batch_size]
+            data = self._get(self.info_url, {'slug': ','.join(chunk), 'skip_invalid': 'true'})
+            if not data.get('data'):
+                print("Error from CMC info API:", data.get('status'))
+                continue
+            for v in data['data'].values():
+                token_info = v[0] if isinstance(v, list) and v else v
+                if isinstance(token_info, dict) and token_info.get('slug'):
+                    infos[token_info['slug'].lower()] = token_info
+        return infos
+
+    def info_by_slug(self, slug):
+        slug = slug.lower()
+        with self._lock:
+            lookup = self._pending.get(slug)
+            if lookup is None:
+                lookup = self._pending[slug] = _PendingLookup()
+            leader = not self._batch_scheduled
+            self._batch_scheduled = True
+
+        if leader:
+            # Give other callers a moment to join this request
+            time.sleep(self.batch_window)
+            with self._lock:
+                batch = self._pending
+                self._pending = {}
+                self._batch_scheduled = False
+            try:
+                infos = self.info_by_slugs(list(batch))
+                for s, pending in batch.items():
+                    pending.value = infos.get(s)
+            except Exception as e:
+                for pending in batch.values():
+                    pending.error = e
+            finally:
+                for pending in batch.values():
+                    pending.done.set()
+
+        lookup.done.wait()
+        if lookup.error is not None:
+            raise lookup.error
+        return lookup.value
@@ -0,0 +1,222 @@
+import json
+import re
+import sys
+
+# Plain-HTTP reader for the data the CoinMarketCap pages render from: the
+# Next.js __NEXT_DATA__ payload embedded in the coin page and the JSON
+# market-pairs endpoint behind the markets table, plus the pool liquidity on
+# a DexScan pair page. Anything unexpected raises
+# MarketDataParseError so the caller can fall back to Selenium.
+
+CMC_SITE_URL = 'https://coinmarketcap.com'
+CMC_DATA_API_URL = 'https://api.coinmarketcap.com/data-api'
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept-Language': 'en-US,en;q=0.9'
+}
+
+NEXT_DATA_RE = re.compile(r'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S)
+# The pair page's "Liquidity" stat box when it is server-rendered
+PAIR_LIQUIDITY_RE = re.compile(r'>\s*Liquidity\s*</div>\s*<div[^>]*>\s*(\$[^<]+?)\s*<')
+
+
+class MarketDataParseError(Exception):
+    pass
+
+
+def format_usd(amount, decimals=0):
+    return "${:,.{}f}".format(amount, decimals)
+
+
+def parse_next_data(html):
+    match = NEXT_DATA_RE.search(html)
+    if not match:
+        raise MarketDataParseError("No __NEXT_DATA__ payload in page")
+    try:
+        return json.loads(match.group(1))
+    except ValueError as e:
+        raise MarketDataParseError(f"Invalid __NEXT_DATA__ JSON: {e}")
+
+
+def _find_node(node, match, depth=0):
+    # Blocks move around between CMC releases; look for the first dict that
+    # satisfies `match` instead of relying on one path
+    if depth > 12:
+        return None
+    if isinstance(node, dict):
+        if match(node):
+            return node
+        children = node.values()
+    elif isinstance(node, list):
+        children = node
+    else:
+        return None
+    for child in children:
+        found = _find_node(child, match, depth + 1)
+        if found is not None:
+            return found
+    return None
+
+
+def _find_numeric(node, key):
+    return _find_node(node, lambda d: isinstance(d.get(key), (int, float)))
+
+
+def _coin_stats(data, slug):
+    # The page also carries related coins, trending lists and so on, each with
+    # their own marketCap; only read numbers from under the requested coin
+    def is_coin(d):
+        return (d.get('slug') == slug or str(d.get('id')) == str(slug)) and _find_numeric(d, 'marketCap') is not None
+    coin = _find_node(data, is_coin)
+    return _find_numeric(coin, 'marketCap') if coin is not None else None
+
+
+def parse_overview_stats(html, slug):
+    stats = _coin_stats(parse_next_data(html), slug)
+    if stats is None:
+        raise MarketDataParseError(f"No market cap for {slug} in __NEXT_DATA__")
+    volume = None
+    for key in ('volume24h', 'volume', 'volume24hUsd'):
+        if isinstance(stats.get(key), (int, float)):
+            volume = stats[key]
+            break
+    if volume is None:
+        raise MarketDataParseError("No 24h volume next to market cap in __NEXT_DATA__")
+    return {'market_cap': format_usd(stats['marketCap']), 'volume_24h': format_usd(volume)}
+
+
+def pool_address(pair_url):
+    # DexScan pair URLs end in the pool address: /dexscan/<chain>/<address>/
+    return pair_url.rstrip('/').rsplit('/', 1)[-1].lower()
+
+
+def pair_liquidity_from_next_data(data, pair_url):
+    # Pool liquidity from a pair page's __NEXT_DATA__, or None. Anchored on
+    # the node that names this pool so other pools listed on the page don't match
+    address = pool_address(pair_url)
+    def is_pool(d):
+        return any(isinstance(v, str) and v.lower() == address for v in d.values()) \
+            and _find_numeric(d, 'liquidity') is not None
+    pool = _find_node(data, is_pool)
+    if pool is None:
+        return None
+    return format_usd(_find_numeric(pool, 'liquidity')['liquidity'])
+
+
+def parse_pair_liquidity(html, pair_url):
+    # Embedded JSON first, then the server-rendered stat box
+    if NEXT_DATA_RE.search(html):
+        liquidity = pair_liquidity_from_next_data(parse_next_data(html), pair_url)
+        if liquidity:
+            return liquidity
+    match = PAIR_LIQUIDITY_RE.search(html)
+    if not match:
+        raise MarketDataParseError("No pool liquidity on pair page")
+    return match.group(1)
+
+
+def parse_market_pairs(payload):
+    # Market-pairs JSON -> market dicts shaped like the Selenium table reader's
+    try:
+        pairs = payload['data']['marketPairs']
+    except (KeyError, TypeError):
+        raise MarketDataParseError("No data.marketPairs in market-pairs response")
+    markets = []
+    for pair in pairs:
+        if not isinstance(pair, dict) or not pair.get('exchangeName'):
+            continue
+        if 'effectiveLiquidity' not in pair:
+            raise MarketDataParseError(f"No effectiveLiquidity for {pair['exchangeName']} in market-pairs response")
+        liquidity_score = pair['effectiveLiquidity']
+        # null is the API's "--" (no score yet), which the table reader also counts as 0
+        if liquidity_score is None:
+            liquidity_score = 0
+        elif isinstance(liquidity_score, bool) or not isinstance(liquidity_score, (int, float)):
+            raise MarketDataParseError(f"Non-numeric effectiveLiquidity {liquidity_score!r} for {pair['exchangeName']}")
+        liquidity_usd = pair.get('liquidity')
+        markets.append({
+            "exchange": pair['exchangeName'],
+            "pair": pair.get('marketPair', ''),
+            "pair_url": pair.get('dexerUrl') or pair.get('marketUrl'),
+            "price": format_usd(pair['price'], 6) if isinstance(pair.get('price'), (int, float)) else '',
+            "volume_24h": format_usd(pair['volumeUsd']) if isinstance(pair.get('volumeUsd'), (int, float)) else '',
+            "liquidity": str(int(round(liquidity_score))),
+            "liquidity_usd": format_usd(liquidity_usd) if isinstance(liquidity_usd, (int, float)) else None
+        })
+    return markets
+
+
+class CMCPageFetcher:
+    # Fetches the coin page and market-pairs JSON over the shared HttpClient
+
+    def __init__(self, http, site_url=CMC_SITE_URL, data_api_url=CMC_DATA_API_URL, timeout=15, pairs_limit=100):
+        self.http = http
+        self.coin_page_url = site_url.rstrip('/') + '/currencies/{slug}/'
+        self.market_pairs_url = data_api_url.rstrip('/') + '/v3/cryptocurrency/market-pairs/latest'
+        self.timeout = timeout
+        self.pairs_limit = pairs_limit
+
+    def fetch_overview_stats(self, slug):
+        resp = self.http.get(self.coin_page_url.format(slug=slug), headers=BROWSER_HEADERS, timeout=self.timeout)
+        if resp.status_code != 200:
+            raise MarketDataParseError(f"Coin page returned HTTP {resp.status_code}")
+        return parse_overview_stats(resp.text, slug)
+
+    def fetch_pair_liquidity(self, pair_url):
+        resp = self.http.get(pair_url, headers=BROWSER_HEADERS, timeout=self.timeout)
+        if resp.status_code != 200:
+            raise MarketDataParseError(f"Pair page returned HTTP {resp.status_code}")
+        return parse_pair_liquidity(resp.text, pair_url)
+
+    def fetch_market_pairs(self, slug, center_type):
+        # center_type is 'cex' or 'dex', the same split as the page's tabs
+        params = {
+            'slug': slug,
+            'start': 1,
+            'limit': self.pairs_limit,
+            'category': 'spot',
+            'centerType': center_type,
+            'sort': 'cmc_rank_advanced',
+            'direction': 'desc'
+        }
+        resp = self.http.get(self.market_pairs_url, params=params, headers=BROWSER_HEADERS, timeout=self.timeout)
+        if resp.status_code != 200:
+            raise MarketDataParseError(f"Market pairs returned HTTP {resp.status_code}")
+        try:
+            payload = resp.json()
+        except ValueError as e:
+            raise MarketDataParseError(f"Market pairs response is not JSON: {e}")
+        return parse_market_pairs(payload)
+
+
+def record_fixtures(slug, prefix):
+    # Saves the live coin page and both market-pairs responses under prefix
+    import requests
+    fetcher = CMCPageFetcher(requests.Session())
+    resp = fetcher.http.get(fetcher.coin_page_url.format(slug=slug), headers=BROWSER_HEADERS, timeout=fetcher.timeout)
+    resp.raise_for_status()
+    with open(f"{prefix}_overview.html", 'w', encoding='utf-8') as f:
+        f.write(resp.text)
+    for center_type in ('cex', 'dex'):
+        params = {'slug': slug, 'start': 1, 'limit': fetcher.pairs_limit, 'category': 'spot',
+                  'centerType': center_type, 'sort': 'cmc_rank_advanced', 'direction': 'desc'}
+        resp = fetcher.http.get(fetcher.market_pairs_url, params=params, headers=BROWSER_HEADERS, timeout=fetcher.timeout)
+        resp.raise_for_status()
+        with open(f"{prefix}_pairs_{center_type}.json", 'w', encoding='utf-8') as f:
+            f.write(resp.text)
+
+
+if __name__ == '__main__':
+    # Offline check against saved pages: python cmc_pages.py fixtures/cmc/<slug>
+    # Re-record them from the live site: python cmc_pages.py --record <slug>
+    if len(sys.argv) > 2 and sys.argv[1] == '--record':
+        record_fixtures(sys.argv[2], f"fixtures/cmc/{sys.argv[2]}")
+        sys.exit(0)
+    prefix = sys.argv[1] if len(sys.argv) > 1 else 'fixtures/cmc/bubblemaps'
+    slug = prefix.rsplit('/', 1)[-1]
+    with open(f"{prefix}_overview.html", encoding='utf-8') as f:
+        print(parse_overview_stats(f.read(), slug))
+    for center_type in ('cex', 'dex'):
+        with open(f"{prefix}_pairs_{center_type}.json", encoding='utf-8') as f:
+            for market in parse_market_pairs(json.load(f)):
+                print(center_type, market)
@@ -0,0 +1,111 @@
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def create_retry(retries=3, backoff_factor=1):
+    # Shared policy: retry connection errors and 429/5xx with exponential
+    # backoff (1, 2, 4s), honoring Retry-After. Status retries only apply to
+    # idempotent methods, so a POST is never sent twice after a 5xx.
+    return Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=[429, 500, 502, 503, 504],
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+
+
+class HttpClient:
+    # One keep-alive requests.Session per host, each with a connection pool
+    # sized for the number of threads that call that host concurrently, the
+    # shared retry policy and a default timeout on every request.
+
+    def __init__(self, pool_size=10, timeout=15, retries=3, backoff_factor=1):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._errors = {}
+
+    def _create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            max_retries=create_retry(self.retries, self.backoff_factor),
+            pool_connections=1,
+            pool_maxsize=self.pool_size
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def session_for(self, url):
+        host = urlsplit(url).netloc
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = self._sessions[host] = self._create_session()
+        return session
+
+    def reset_host(self, url):
+        # Drop a host's pooled connections, e.g. after repeated failures
+        host = urlsplit(url).netloc
+        with self._lock:
+            session = self._sessions.pop(host, None)
+        if session is not None:
+            session.close()
+
+    def request(self, method, url, **kwargs):
+        host = urlsplit(url).netloc
+        kwargs.setdefault('timeout', self.timeout)
+        with self._lock:
+            self._requests[host] = self._requests.get(host, 0) + 1
+        try:
+            return self.session_for(url).request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self._errors[host] = self._errors.get(host, 0) + 1
+            raise
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        # Per host: requests made, connections opened and how many requests
+        # were served on an already-open connection
+        stats = {}
+        with self._lock:
+            sessions = dict(self._sessions)
+            requests_by_host = dict(self._requests)
+            errors_by_host = dict(self._errors)
+        for host in set(sessions) | set(requests_by_host):
+            connections = 0
+            sent = 0
+            session = sessions.get(host)
+            if session is not None:
+                for adapter in set(session.adapters.values()):
+                    pools = adapter.poolmanager.pools
+                    for key in pools.keys():
+                        pool = pools.get(key)
+                        if pool is not None:
+                            connections += pool.num_connections
+                            sent += pool.num_requests
+            stats[host] = {
+                'requests': requests_by_host.get(host, 0),
+                'errors': errors_by_host.get(host, 0),
+                'connections_opened': connections,
+                'connections_reused': max(0, sent - connections),
+                'pool_size': self.pool_size
+            }
+        return stats
@@ -0,0 +1,54 @@
+import queue
+import threading
+
+
+class JobQueue:
+    # Bounded queue drained by a fixed number of worker threads. submit() never
+    # blocks: when the queue is full it returns False so the caller can push
+    # back on the sender instead of tying up a request thread.
+
+    def __init__(self, handler, workers=2, max_depth=20, name='jobs'):
+        self._handler = handler
+        self.workers = max(1, workers)
+        self.max_depth = max_depth
+        self.name = name
+        self._queue = queue.Queue(maxsize=max_depth)
+        self._threads = []
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"{self.name}-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, job):
+        try:
+            self._queue.put_nowait(job)
+            return True
+        except queue.Full:
+            print(f"[DEBUG] {self.name} queue full ({self.max_depth}), rejecting job")
+            return False
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def active(self):
+        return self._active
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self._active += 1
+            try:
+                self._handler(job)
+            except Exception as e:
+                print(f"[ERROR] {self.name} job failed: {e}")
+            finally:
+                with self._lock:
+                    self._active -= 1
+                self._queue.task_done()
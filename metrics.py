@@ -0,0 +1,192 @@
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Minimal in-process metrics with Prometheus text exposition, plus the per-request
+# trace id that ties log lines from one proposal together across threads.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for k, v in labels:
+        v = str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{k}="{v}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._series = {}  # labels -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    labels = key + (('le', _format_value(bound)),)
+                    lines.append(f"{self.name}_bucket{_format_labels(labels)} {bucket_count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class CallbackMetric:
+    # Value(s) read at scrape time from live objects (queue depth, pool size, cache stats).
+    # fn returns a number or a list of (labels dict, number).
+
+    def __init__(self, name, help_text, metric_type, fn):
+        self.name = name
+        self.help = help_text
+        self.type = metric_type
+        self._fn = fn
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        try:
+            values = self._fn()
+        except Exception as e:
+            print(f"[ERROR] Metric {self.name} failed: {e}")
+            return lines
+        if not isinstance(values, list):
+            values = [({}, values)]
+        for labels, value in values:
+            lines.append(f"{self.name}{_format_labels(tuple(sorted(labels.items())))} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text):
+        return self.register(Counter(name, help_text))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, buckets))
+
+    def callback(self, name, help_text, fn, metric_type='gauge'):
+        return self.register(CallbackMetric(name, help_text, metric_type, fn))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram('victus_stage_duration_seconds', 'Time spent in each proposal pipeline stage')
+STAGE_ERRORS = REGISTRY.counter('victus_stage_errors_total', 'Pipeline stages that raised')
+
+# Scrape spans also label STAGE_SECONDS by page and source, so a slow pair page
+# or a fallback to the browser shows up on its own series. Values outside these
+# sets are recorded as 'other' to keep the label space fixed.
+SCRAPE_PAGES = ('markets', 'overview', 'pair')
+SCRAPE_SOURCES = ('http', 'selenium')
+
+_local = threading.local()
+
+
+def new_trace_id():
+    return uuid.uuid4().hex[:16]
+
+
+def set_trace_id(trace_id):
+    _local.trace_id = trace_id
+
+
+def get_trace_id():
+    return getattr(_local, 'trace_id', None)
+
+
+def log_event(event, **fields):
+    # One JSON object per line so logs can be grepped/filtered by trace_id
+    record = {'ts': round(time.time(), 3), 'trace_id': get_trace_id(), 'event': event}
+    record.update(fields)
+    print(json.dumps(record, default=str))
+
+
+def _bounded(value, allowed):
+    return value if value in allowed else 'other'
+
+
+@contextmanager
+def span(stage, page=None, source=None, **fields):
+    labels = {'stage': stage}
+    if page is not None:
+        labels['page'] = fields['page'] = _bounded(page, SCRAPE_PAGES)
+    if source is not None:
+        labels['source'] = fields['source'] = _bounded(source, SCRAPE_SOURCES)
+    start = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except Exception:
+        ok = False
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, **labels)
+        log_event('stage', stage=stage, ms=round(elapsed * 1000, 1), ok=ok, **fields)
+
+
+def timed(stage, fn):
+    # Wraps fn so every call is recorded as a span of `stage`
+    def wrapper(*args, **kwargs):
+        with span(stage):
+            return fn(*args, **kwargs)
+    wrapper.__name__ = getattr(fn, '__name__', stage)
+    return wrapper
@@ -0,0 +1,133 @@
+import re
+
+# Number parsing for the strings CMC shows in its stats and markets tables:
+# "$71,241,774", "$8.94M", "$3,120,450*", "612", "--". The first number in a
+# string (plus an optional T/B/M/K suffix) is its value; anything without a
+# number ("--", "", None) parses as 0.
+#
+# Separators follow en-US unless the token itself says otherwise: commas are
+# grouping ("$12,34" is 1234) and '.' is the decimal point, so "1.234.567" is
+# not a number. Within one token, a '.' before a ',' makes the comma the
+# decimal point ("1.234.567,89"), and spaces, no-break spaces or apostrophes
+# between groups of exactly three digits are grouping ("1 234 567,89",
+# "1'234'567"). Separate tokens are never joined: "$1,234,567 100%" is 1234567.
+#
+# parse_numbers() and friends take a whole table column: plain cells go
+# straight to float() and the rest are parsed with a single findall.
+
+_GROUPED = r"\d{1,3}(?:[ '\u00a0\u202f]\d{3}(?![\d%]))+(?:[.,]\d+)?"
+_PLAIN = r"[.,]?\d[\d,.]*"
+_NUMBER = r"(?:(" + _GROUPED + r")|(" + _PLAIN + r"))\s*([TBMK]?)"
+# (grouped, plain, suffix)
+NUMBER_RE = re.compile(_NUMBER)
+# One match per NUL-terminated cell, ('', '', '') for a cell without a number
+COLUMN_RE = re.compile(r"(?:[^\d\x00]*?" + _NUMBER + r")?[^\x00]*\x00")
+GROUP_SPACES = str.maketrans('', '', " '\u00a0\u202f")
+# Cells that mean "no value", straight to 0
+MISSING = {'': 0, '--': 0}
+SUFFIXES = {'T': 1_000_000_000_000, 'B': 1_000_000_000, 'M': 1_000_000, 'K': 1_000, '': 1}
+
+
+def _to_float(plain):
+    # A token without space grouping
+    plain = plain.rstrip(',.')
+    if ',' in plain:
+        dot = plain.rfind('.')
+        if dot != -1 and plain.rfind(',') > dot:
+            return float(plain.replace('.', '').replace(',', '.'))
+        return float(plain.replace(',', ''))
+    return float(plain)
+
+
+def _grouped_to_float(grouped):
+    return float(grouped.translate(GROUP_SPACES).replace(',', '.'))
+
+
+def _match_value(grouped, plain, suffix):
+    if grouped:
+        return _grouped_to_float(grouped) * SUFFIXES[suffix]
+    return _to_float(plain) * SUFFIXES[suffix]
+
+
+def parse_number(val):
+    # First number in val as a float, suffix applied; 0 when there is none
+    if not val:
+        return 0
+    # Most cells are plain "$1,234" / "612"; those skip the regex
+    plain = val.lstrip('$').replace(',', '')
+    if plain.isdecimal():
+        return float(plain)
+    if plain in MISSING:
+        return 0
+    match = NUMBER_RE.search(val)
+    if not match:
+        return 0
+    try:
+        return _match_value(*match.groups())
+    except ValueError:
+        return 0
+
+
+def parse_dollar(val):
+    # Whole dollars, the way the tier thresholds compare them
+    return int(parse_number(val))
+
+
+def parse_score(val):
+    # CMC liquidity scores are integers; "--" means no score
+    return int(parse_number(str(val)))
+
+
+def parse_numbers(values):
+    # One float per cell, same results as [parse_number(v) for v in values]
+    values = [v or '' for v in values]
+    if not values:
+        return []
+    # Plain "$1,234" / "612" cells need no regex at all, and the rest ("$8.94M",
+    # "--", "$3,120,450*", "1 234 567") share one findall
+    out = []
+    rest = []
+    for i, val in enumerate(values):
+        if val.isdecimal():
+            out.append(float(val))
+            continue
+        plain = val.lstrip('$').replace(',', '')
+        if plain.isdecimal():
+            out.append(float(plain))
+        elif plain in MISSING:
+            out.append(0)
+        else:
+            out.append(0)
+            rest.append(i)
+    if rest:
+        text = '\x00'.join([values[i] for i in rest]) + '\x00'
+        if text.count('\x00') != len(rest):
+            for i in rest:
+                out[i] = parse_number(values[i])
+            return out
+        for i, match in zip(rest, COLUMN_RE.findall(text)):
+            try:
+                out[i] = _match_value(*match) if match[0] or match[1] else 0
+            except ValueError:
+                out[i] = 0
+    return out
+
+
+def parse_dollars(values):
+    return [int(n) for n in parse_numbers(values)]
+
+
+def parse_scores(values):
+    # Score cells are nearly all bare integers or "--", so one comprehension
+    # settles them and only the others ("1,024") go through parse_numbers
+    try:
+        out = [int(v) if v.isdecimal() else MISSING.get(v) for v in values]
+    except AttributeError:
+        # A None cell; rare enough not to check for up front
+        values = [v or '' for v in values]
+        out = [int(v) if v.isdecimal() else MISSING.get(v) for v in values]
+    if None in out:
+        rest = [i for i, v in enumerate(out) if v is None]
+        for i, number in zip(rest, parse_numbers([values[i] for i in rest])):
+            out[i] = int(number)
+    return out
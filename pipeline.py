@@ -0,0 +1,151 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+
+from metrics import span, get_trace_id, set_trace_id
+
+
+class PipelineError(Exception):
+    # A stage giving up with a message meant for the user (e.g. unknown slug)
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.status = status
+
+
+class StageTimeout(PipelineError):
+    # Routes answer it like any other PipelineError, as a gateway timeout
+    def __init__(self, message):
+        super().__init__(message, status=504)
+
+
+class Stage:
+    # fn(ctx) reads what earlier stages put in the ctx dict and returns a dict of
+    # keys to add (or None). Updates are applied by the pipeline, so a stage that
+    # timed out can't change ctx behind the caller's back.
+    # timeout: seconds before the caller stops waiting (the stage runs on the
+    # pipeline's executor); None runs it inline on the caller's thread.
+    # concurrency: max callers inside this stage at once across the process.
+    def __init__(self, name, fn, timeout=None, concurrency=None):
+        self.name = name
+        self.fn = fn
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(concurrency) if concurrency else None
+
+
+class Pipeline:
+    # Ordered stages shared by every route that builds a proposal, so caching,
+    # timeouts and instrumentation are applied in one place. Each stage is
+    # recorded as a span named after it.
+
+    def __init__(self, stages, max_workers=8, name='pipeline'):
+        self.stages = list(stages)
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    def stage(self, name):
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError(name)
+
+    def replace(self, name, fn=None, timeout=None, concurrency=None):
+        # Swap a stage's implementation or limits, e.g. from a benchmark or a test
+        old = self.stage(name)
+        new = Stage(name, fn or old.fn, timeout if timeout is not None else old.timeout, concurrency)
+        if concurrency is None:
+            new._slots = old._slots
+        self.stages = [new if s is old else s for s in self.stages]
+
+    def run(self, ctx, stop_after=None):
+        for stage in self.stages:
+            self._run_stage(stage, ctx)
+            if stage.name == stop_after:
+                break
+        return ctx
+
+    def _run_stage(self, stage, ctx):
+        if stage._slots is not None:
+            stage._slots.acquire()
+        try:
+            with span(stage.name, pipeline=self.name):
+                if stage.timeout is None:
+                    updates = stage.fn(ctx)
+                else:
+                    updates = self._call_with_timeout(stage, ctx)
+            if updates:
+                ctx.update(updates)
+        finally:
+            if stage._slots is not None:
+                stage._slots.release()
+
+    def _call_with_timeout(self, stage, ctx):
+        trace_id = get_trace_id()
+
+        def call():
+            set_trace_id(trace_id)
+            return stage.fn(dict(ctx))
+
+        future = self._executor.submit(call)
+        try:
+            return future.result(timeout=stage.timeout)
+        except FutureTimeout:
+            # The stage keeps running in the background; its result is dropped
+            future.cancel()
+            raise StageTimeout(f"{stage.name} took longer than {stage.timeout:g}s")
+
+
+class FanOut:
+    # Runs independent tasks of one request at the same time on a bounded
+    # thread pool. Each task has its own timeout and the whole run has a
+    # deadline; tasks still running at their limit are given up on (left to
+    # finish in the background) so the caller can build a partial result.
+    # stop_when(results) is checked as tasks finish and ends the run early
+    # once the finished ones already decide the outcome.
+
+    def __init__(self, max_workers=16, name='fanout'):
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    def run(self, tasks, deadline=None, stop_when=None):
+        # tasks: {name: (fn, timeout or None)}. Returns (results, errors, skipped):
+        # values by task name, exceptions (StageTimeout included) by task name,
+        # and the names abandoned because stop_when said so.
+        trace_id = get_trace_id()
+        start = time.monotonic()
+        run_end = start + deadline if deadline else float('inf')
+        futures = {}
+        for name, (fn, timeout) in tasks.items():
+            future = self._executor.submit(self._call, trace_id, name, fn)
+            futures[future] = (name, min(run_end, start + timeout if timeout else float('inf')))
+
+        results, errors = {}, {}
+        pending = set(futures)
+        while pending:
+            now = time.monotonic()
+            for future in [f for f in pending if futures[f][1] <= now]:
+                pending.discard(future)
+                future.cancel()
+                name = futures[future][0]
+                errors[name] = StageTimeout(f"{name} took longer than {futures[future][1] - start:.3g}s")
+            if not pending:
+                break
+            next_end = min(futures[f][1] for f in pending)
+            done, pending = wait(pending, timeout=None if next_end == float('inf') else max(0, next_end - now),
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures[future][0]
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    errors[name] = e
+            if pending and stop_when is not None and stop_when(results):
+                break
+        skipped = [futures[f][0] for f in pending]
+        for future in pending:
+            future.cancel()
+        return results, errors, skipped
+
+    def _call(self, trace_id, name, fn):
+        set_trace_id(trace_id)
+        with span(name, fanout=self.name):
+            return fn()
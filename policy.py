@@ -0,0 +1,185 @@
+import json
+import os
+import re
+import threading
+import time
+
+# Business rules that change without a code change: the tier-1/2 exchanges,
+# the CEXes the market readers keep and the investment tier tables. They are
+# read from a JSON policy file, compiled once into a Policy (one regex per
+# exchange list, sorted bounds for the tier lookups) and swapped in whole when
+# the file changes, so a reader always sees one consistent version.
+
+INF = float('inf')
+
+# The policy.json shipped next to this file holds the rules. A POLICY_PATH file
+# only needs the keys it changes; the rest come from the shipped one.
+DEFAULT_POLICY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'policy.json')
+
+# Schema:
+#   tier1_exchanges, tier2_exchanges  exchange names, case-sensitive substrings
+#   cex_names                         CEXes the market readers keep, case-insensitive substrings
+#   min_market_cap, min_volume_24h, min_dex_liquidity   USD
+#   dex_tiers  [{above, up_to, label, offer}] on the top DEX pair's pool
+#              liquidity in USD; "up_to": null means no upper bound
+#   cex_tiers  [{score_above, score_up_to, volume_above, volume_up_to, label, offer}]
+#              used when there is no DEX market: the best tier-1/2 CEX liquidity
+#              score picks the row, then 24h volume must be in that row's range;
+#              null bounds are open and "offer": null means skip
+#   offer      [daily transaction min, daily transaction max, minimum commitment, investment]
+# Both tier tables must be sorted by their upper bound.
+
+
+class PolicyError(Exception):
+    pass
+
+
+def compile_names(names, ignore_case=False):
+    # One alternation for "any of these names is a substring of the exchange";
+    # longest first so overlapping names match the same way every time
+    if not names:
+        return re.compile(r'(?!)')
+    pattern = '|'.join(re.escape(n) for n in sorted(set(names), key=len, reverse=True))
+    return re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+
+
+def short_usd(amount):
+    for divisor, suffix in ((1_000_000_000, 'B'), (1_000_000, 'M'), (1_000, 'K')):
+        if amount >= divisor:
+            return f"{amount / divisor:g}{suffix}"
+    return f"{amount:g}"
+
+
+def _bound(value, default):
+    return default if value is None else float(value)
+
+
+def _offer(value):
+    if value is None:
+        return None
+    if len(value) != 4:
+        raise PolicyError(f"offer must be [min, max, commitment, investment], got {value!r}")
+    return tuple(str(v) for v in value)
+
+
+def read_policy_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        source = json.load(f)
+    if not isinstance(source, dict):
+        raise PolicyError(f"{path} must hold a JSON object")
+    return source
+
+
+_default_source = None
+
+
+def default_source():
+    # The shipped policy.json, read once
+    global _default_source
+    if _default_source is None:
+        try:
+            _default_source = read_policy_file(DEFAULT_POLICY_PATH)
+        except (OSError, ValueError) as e:
+            raise PolicyError(f"Could not read default policy {DEFAULT_POLICY_PATH}: {e}")
+    return _default_source
+
+
+class Policy:
+    def __init__(self, source):
+        merged = dict(default_source())
+        merged.update(source or {})
+        self.source = merged
+        try:
+            self.tier1_exchanges = list(merged['tier1_exchanges'])
+            self.tier2_exchanges = list(merged['tier2_exchanges'])
+            # Same semantics as the old `any(t in exchange ...)` checks: tier names are
+            # case-sensitive substrings, CEX names case-insensitive substrings
+            self.tier_exchange_re = compile_names(self.tier1_exchanges + self.tier2_exchanges)
+            self.cex_name_re = compile_names(merged['cex_names'], ignore_case=True)
+            self.min_market_cap = float(merged['min_market_cap'])
+            self.min_volume_24h = float(merged['min_volume_24h'])
+            self.min_dex_liquidity = float(merged['min_dex_liquidity'])
+            # (above, up to and including, label, offer)
+            self.dex_tiers = [(float(t['above']), _bound(t.get('up_to'), INF), t['label'], _offer(t['offer']))
+                              for t in merged['dex_tiers']]
+            # (score above, score up to, volume above, volume up to, label, offer or None)
+            self.cex_tiers = [(float(t['score_above']), _bound(t.get('score_up_to'), INF),
+                               _bound(t.get('volume_above'), -INF), _bound(t.get('volume_up_to'), INF),
+                               t['label'], _offer(t.get('offer')))
+                              for t in merged['cex_tiers']]
+        except (KeyError, TypeError, ValueError) as e:
+            raise PolicyError(f"Invalid policy: {e!r}")
+        for name, table in (('dex_tiers', self.dex_tiers), ('cex_tiers', self.cex_tiers)):
+            uppers = [row[1] for row in table]
+            if uppers != sorted(uppers):
+                raise PolicyError(f"{name} must be sorted by upper bound")
+        self.dex_upper = [row[1] for row in self.dex_tiers]
+        self.cex_upper = [row[1] for row in self.cex_tiers]
+
+    def is_tier_exchange(self, exchange):
+        return self.tier_exchange_re.search(exchange) is not None
+
+    def is_known_cex(self, exchange):
+        return self.cex_name_re.search(exchange) is not None
+
+
+class PolicyStore:
+    # Holds the current Policy and reloads it when the file's mtime changes.
+    # A file that fails to parse or validate is reported and the previous
+    # policy stays in effect.
+
+    def __init__(self, path, interval=5):
+        self.path = path
+        self.interval = interval
+        self._policy = Policy(None)
+        self._mtime = None
+        self.loaded_at = 0
+        self.reloads = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def current(self):
+        return self._policy
+
+    def reload(self, force=False):
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                if self._mtime is not None:
+                    print(f"[ERROR] Policy file {self.path} disappeared, keeping the loaded policy")
+                    self._mtime = None
+                return False
+            if mtime == self._mtime and not force:
+                return False
+            try:
+                policy = Policy(read_policy_file(self.path))
+            except (OSError, ValueError, PolicyError) as e:
+                self.errors += 1
+                self._mtime = mtime  # don't retry the same broken file every interval
+                print(f"[ERROR] Could not load policy {self.path}: {e}")
+                return False
+            self._policy = policy
+            self._mtime = mtime
+            self.loaded_at = time.time()
+            self.reloads += 1
+            print(f"[DEBUG] Loaded policy from {self.path}")
+            return True
+
+    def start(self):
+        self.reload()
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._watch, name='policy-watch', daemon=True)
+            self._thread.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"[ERROR] Policy watcher error: {e}")
+
+    def stats(self):
+        return {'path': self.path, 'loaded_at': self.loaded_at, 'reloads': self.reloads, 'errors': self.errors}
@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+
+from singleflight import SingleFlight
+
+
+class Stored:
+    # What a compute function returns for a value produced earlier (e.g. read
+    # back from disk), so the cache gives it its real age instead of now
+    def __init__(self, value, stored_at):
+        self.value = value
+        self.stored_at = stored_at
+
+
+class ResultCache:
+    # LRU cache of per-key results with a freshness TTL and a stale window.
+    # Fresh entries are returned as-is. Entries past ttl but within
+    # ttl + stale_ttl are still returned while a single background refresh
+    # runs. Misses and refreshes go through a SingleFlight so concurrent
+    # callers share one computation. Computed values that fail cacheable(value)
+    # are returned to their callers but not stored, so a bad refresh result
+    # never replaces a good stale entry.
+
+    def __init__(self, ttl=300, stale_ttl=900, max_entries=256, name='cache', flights=None, cacheable=None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.name = name
+        self.flights = flights or SingleFlight()
+        self.cacheable = cacheable
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+        self.uncacheable = 0
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.time() - entry[0]
+                if age < self.ttl:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                if age < self.ttl + self.stale_ttl:
+                    self.stale_hits += 1
+                    self._entries.move_to_end(key)
+                    if not self.flights.in_flight(key):
+                        threading.Thread(target=self._refresh, args=(key, compute),
+                                         name=f"{self.name}-refresh", daemon=True).start()
+                    return entry[1]
+            self.misses += 1
+        return self.flights.do(key, lambda: self._compute(key, compute))
+
+    def _compute(self, key, compute):
+        value = compute()
+        stored_at = None
+        if isinstance(value, Stored):
+            value, stored_at = value.value, value.stored_at
+        if self.cacheable is not None and not self.cacheable(value):
+            with self._lock:
+                self.uncacheable += 1
+            return value
+        self.set(key, value, stored_at=stored_at)
+        return value
+
+    def _refresh(self, key, compute):
+        try:
+            self.flights.do(key, lambda: self._compute(key, compute))
+        except Exception as e:
+            with self._lock:
+                self.refresh_errors += 1
+            print(f"[ERROR] {self.name} refresh for {key} failed: {e}")
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] >= self.ttl + self.stale_ttl:
+                return None
+            return entry[1]
+
+    def set(self, key, value, stored_at=None):
+        with self._lock:
+            self._entries[key] = (stored_at or time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'stale_ttl': self.stale_ttl,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'refresh_errors': self.refresh_errors,
+                'uncacheable': self.uncacheable
+            }
+        stats['flights'] = self.flights.stats()
+        return stats
@@ -0,0 +1,57 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    # Collapses concurrent calls for the same key into one execution. The first
+    # caller runs fn; everyone arriving while it is in flight waits and gets the
+    # same result (or the same exception).
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+
+        if leader:
+            try:
+                call.value = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.value
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def stats(self):
+        with self._lock:
+            return {'executions': self.executions, 'shared': self.shared, 'in_flight': len(self._calls)}
@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+import time
+
+
+class SlugIndex:
+    # In-process lookup tables built from the CMC /v1/cryptocurrency/map listing.
+    # The listing is loaded once from a snapshot on disk and refreshed in the
+    # background every ttl_seconds, so a lookup is a dict probe instead of a
+    # full map download plus a linear scan.
+
+    def __init__(self, fetch_map, snapshot_path, ttl_seconds, miss_refresh_seconds=600):
+        self._fetch_map = fetch_map
+        self.snapshot_path = snapshot_path
+        self.ttl_seconds = ttl_seconds
+        self.miss_refresh_seconds = miss_refresh_seconds
+        # (by_slug, by_symbol, by_id) is swapped as a single tuple so readers
+        # never see a half-built index
+        self._tables = ({}, {}, {})
+        self.loaded_at = 0
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _build(self, coins, fetched_at):
+        by_slug = {}
+        by_symbol = {}
+        by_id = {}
+        for coin in coins:
+            slug = (coin.get('slug') or '').lower()
+            if slug:
+                by_slug[slug] = coin
+            symbol = (coin.get('symbol') or '').upper()
+            if symbol:
+                by_symbol.setdefault(symbol, []).append(coin)
+            if coin.get('id') is not None:
+                by_id[int(coin['id'])] = coin
+        # Lowest rank first so by_symbol()[0] is the best known coin for a ticker
+        for matches in by_symbol.values():
+            matches.sort(key=lambda c: c.get('rank') or float('inf'))
+        self._tables = (by_slug, by_symbol, by_id)
+        self.loaded_at = fetched_at
+
+    def load_snapshot(self):
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            self._build(snapshot.get('data', []), snapshot.get('fetched_at', 0))
+            print(f"[DEBUG] Loaded {len(self._tables[0])} slugs from {self.snapshot_path}")
+            return True
+        except (OSError, ValueError) as e:
+            print(f"[DEBUG] No usable slug index snapshot: {e}")
+            return False
+
+    def _save_snapshot(self, coins, fetched_at):
+        tmp_path = f"{self.snapshot_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'fetched_at': fetched_at, 'data': coins}, f)
+            # Atomic swap so other workers never read a partial file
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            print(f"[ERROR] Could not write slug index snapshot: {e}")
+
+    def refresh(self, wait=False):
+        # Only one refresh at a time. Background callers skip if one is running,
+        # waiting callers block and reuse its result instead of fetching again.
+        requested_at = time.time()
+        if not self._refresh_lock.acquire(blocking=wait):
+            return False
+        try:
+            if self.loaded_at >= requested_at:
+                return True
+            coins = self._fetch_map()
+            if not coins:
+                print("[ERROR] CMC map refresh returned no data, keeping current index")
+                return False
+            fetched_at = time.time()
+            self._build(coins, fetched_at)
+            self._save_snapshot(coins, fetched_at)
+            print(f"[DEBUG] Slug index refreshed with {len(coins)} coins")
+            return True
+        except Exception as e:
+            print(f"[ERROR] CMC map refresh failed: {e}")
+            return False
+        finally:
+            self._refresh_lock.release()
+
+    def is_stale(self):
+        return time.time() - self.loaded_at >= self.ttl_seconds
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.load_snapshot()
+        self._thread = threading.Thread(target=self._run, name='slug-index-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        # Refresh straight away if the snapshot is missing or past its TTL,
+        # then keep it fresh on the TTL interval
+        if self.is_stale():
+            self.refresh()
+        while not self._stop.wait(self._seconds_until_stale()):
+            self.refresh()
+
+    def _seconds_until_stale(self):
+        # Floor of a minute so a failing CMC API isn't hammered in a tight loop
+        return max(60, self.ttl_seconds - (time.time() - self.loaded_at))
+
+    def get(self, slug):
+        if not slug:
+            return None
+        coin = self._tables[0].get(slug.lower())
+        if coin is None and time.time() - self.loaded_at >= self.miss_refresh_seconds:
+            # Unknown slug and an old index: the coin may be a new listing
+            if self.refresh(wait=True):
+                coin = self._tables[0].get(slug.lower())
+        return coin
+
+    def by_symbol(self, symbol):
+        if not symbol:
+            return []
+        return self._tables[1].get(symbol.upper(), [])
+
+    def by_id(self, cmc_id):
+        try:
+            return self._tables[2].get(int(cmc_id))
+        except (TypeError, ValueError):
+            return None
+
+    def __len__(self):
+        return len(self._tables[0])
@@ -0,0 +1,112 @@
+import json
+import sqlite3
+import sys
+import threading
+import time
+
+
+class SnapshotStore:
+    # Every market snapshot the app builds, kept in SQLite (WAL mode) keyed by
+    # slug and scrape time. The latest row per slug warms the in-memory result
+    # cache after a restart and lets any worker skip a scrape while it is
+    # fresh; older rows are the history operators query for how a token's
+    # market cap, volume and liquidity moved. Rows older than retention_days
+    # are pruned.
+
+    def __init__(self, path, retention_days=90, prune_every=500, busy_timeout=5):
+        self.path = path
+        self.retention_seconds = retention_days * 24 * 60 * 60
+        self.prune_every = prune_every
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._writes = 0
+        db = self._connection()
+        db.execute("CREATE TABLE IF NOT EXISTS snapshots (slug TEXT NOT NULL, scraped_at REAL NOT NULL, "
+                   "market_cap TEXT, volume_24h TEXT, dex_liquidity TEXT, cex_liquidity_score TEXT, "
+                   "data TEXT NOT NULL)")
+        db.execute("CREATE INDEX IF NOT EXISTS snapshots_slug_time ON snapshots (slug, scraped_at)")
+
+    def _connection(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def save(self, slug, snapshot, scraped_at=None):
+        dex = (snapshot.get('top_dex_market') or [{}])[0]
+        cex = (snapshot.get('top_cex_market') or [{}])[0]
+        try:
+            self._connection().execute(
+                "INSERT INTO snapshots (slug, scraped_at, market_cap, volume_24h, dex_liquidity, "
+                "cex_liquidity_score, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (slug.lower(), scraped_at or time.time(), snapshot.get('market_cap'), snapshot.get('volume_24h'),
+                 dex.get('final_liquidity') or dex.get('liquidity'), cex.get('liquidity'),
+                 json.dumps(snapshot, separators=(',', ':'))))
+        except sqlite3.Error as e:
+            print(f"[ERROR] Could not store snapshot for {slug}: {e}")
+            return
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune()
+
+    def latest(self, slug, max_age=None):
+        # (scraped_at, snapshot) for the newest row no older than max_age, or None
+        query = "SELECT scraped_at, data FROM snapshots WHERE slug = ?"
+        params = [slug.lower()]
+        if max_age is not None:
+            query += " AND scraped_at >= ?"
+            params.append(time.time() - max_age)
+        row = self._connection().execute(query + " ORDER BY scraped_at DESC LIMIT 1", params).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def latest_all(self, max_age, limit=256):
+        # [(slug, scraped_at, snapshot)] newest first, one per slug scraped within max_age
+        rows = self._connection().execute(
+            "SELECT s.slug, s.scraped_at, s.data FROM snapshots s "
+            "JOIN (SELECT slug, MAX(scraped_at) AS scraped_at FROM snapshots WHERE scraped_at >= ? GROUP BY slug) m "
+            "ON s.slug = m.slug AND s.scraped_at = m.scraped_at ORDER BY s.scraped_at DESC LIMIT ?",
+            (time.time() - max_age, limit)).fetchall()
+        return [(slug, scraped_at, json.loads(data)) for slug, scraped_at, data in rows]
+
+    def history(self, slug, since=None, limit=100):
+        # Newest first, headline numbers only
+        query = ("SELECT scraped_at, market_cap, volume_24h, dex_liquidity, cex_liquidity_score "
+                 "FROM snapshots WHERE slug = ?")
+        params = [slug.lower()]
+        if since is not None:
+            query += " AND scraped_at >= ?"
+            params.append(since)
+        rows = self._connection().execute(query + " ORDER BY scraped_at DESC LIMIT ?", params + [limit]).fetchall()
+        return [{
+            'scraped_at': scraped_at,
+            'market_cap': market_cap,
+            'volume_24h': volume_24h,
+            'dex_liquidity': dex_liquidity,
+            'cex_liquidity_score': cex_liquidity_score
+        } for scraped_at, market_cap, volume_24h, dex_liquidity, cex_liquidity_score in rows]
+
+    def prune(self):
+        try:
+            self._connection().execute("DELETE FROM snapshots WHERE scraped_at < ?",
+                                       (time.time() - self.retention_seconds,))
+        except sqlite3.Error as e:
+            print(f"[ERROR] Pruning snapshots failed: {e}")
+
+    def stats(self):
+        db = self._connection()
+        rows, slugs = db.execute("SELECT COUNT(*), COUNT(DISTINCT slug) FROM snapshots").fetchone()
+        return {'rows': rows, 'slugs': slugs}
+
+
+if __name__ == '__main__':
+    # Liquidity history without starting the app: python snapshot_store.py <slug> [db path]
+    store = SnapshotStore(sys.argv[2] if len(sys.argv) > 2 else 'snapshots.sqlite3')
+    for entry in store.history(sys.argv[1], limit=1000):
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['scraped_at']))
+        print(f"{stamp}  mcap={entry['market_cap']}  vol24h={entry['volume_24h']}  "
+              f"dex_liquidity={entry['dex_liquidity']}  cex_score={entry['cex_liquidity_score']}")
@@ -0,0 +1,213 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+from metrics import span
+
+
+class _Outgoing:
+    def __init__(self, chat_id, text, parse_mode, status_key=None):
+        self.chat_id = chat_id
+        self.text = text
+        self.parse_mode = parse_mode
+        self.status_key = status_key
+        self.attempts = 0
+
+
+class TelegramOutbox:
+    # Queue of outgoing Telegram messages drained by one background sender.
+    # Callers never block: send() and status() only enqueue. The sender keeps
+    # to Telegram's limits (one message per chat every chat_interval seconds,
+    # global_rate messages per second overall), waits out retry_after on 429
+    # and retries other failures with backoff.
+    #
+    # status() messages are keyed: the first one for a key is sent, later
+    # ones edit that message in place, and an update still waiting in the
+    # queue is overwritten rather than sent twice.
+
+    def __init__(self, http, api_base, global_rate=25, chat_interval=1.0, max_attempts=5,
+                 max_pending=1000, timeout=10):
+        self.http = http
+        self.api_base = api_base
+        self.global_interval = 1.0 / global_rate
+        self.chat_interval = chat_interval
+        self.max_attempts = max_attempts
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._queues = OrderedDict()  # chat_id -> deque of _Outgoing
+        self._ready_at = {}  # chat_id -> earliest time the chat may be sent to again
+        self._next_global = 0
+        self._pending = 0
+        self._in_flight = False  # the sender has taken an item off the queue and not finished it
+        self._status_messages = OrderedDict()  # status_key -> Telegram message_id
+        self._cond = threading.Condition()
+        self._thread = None
+        self.sent = 0
+        self.edited = 0
+        self.merged = 0
+        self.rate_limited = 0
+        self.dropped = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='telegram-outbox', daemon=True)
+            self._thread.start()
+
+    def send(self, chat_id, text, parse_mode='HTML'):
+        return self._enqueue(_Outgoing(chat_id, text, parse_mode))
+
+    def status(self, chat_id, status_key, text, parse_mode='HTML'):
+        with self._cond:
+            for item in self._queues.get(chat_id, ()):
+                if item.status_key == status_key:
+                    # Still queued: just send the newest text
+                    item.text = text
+                    self.merged += 1
+                    return True
+        return self._enqueue(_Outgoing(chat_id, text, parse_mode, status_key))
+
+    def _enqueue(self, item):
+        with self._cond:
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                print(f"[ERROR] Telegram outbox full, dropping message for chat {item.chat_id}")
+                return False
+            self._queues.setdefault(item.chat_id, deque()).append(item)
+            self._pending += 1
+            self._cond.notify()
+        return True
+
+    def depth(self):
+        return self._pending
+
+    def flush(self, timeout=5):
+        # Waits until the queue is empty and the last send has finished;
+        # returns False if that didn't happen within timeout
+        deadline = time.time() + timeout
+        with self._cond:
+            while self._pending or self._in_flight:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _next_item(self):
+        # Called with the lock held. Round-robins over chats whose per-chat
+        # interval has passed; returns (item, None) or (None, seconds_to_wait).
+        now = time.time()
+        if len(self._ready_at) > 1000:
+            self._ready_at = {c: t for c, t in self._ready_at.items() if t > now or c in self._queues}
+        soonest = None
+        for chat_id in list(self._queues):
+            ready_at = self._ready_at.get(chat_id, 0)
+            if ready_at <= now:
+                items = self._queues.pop(chat_id)
+                item = items.popleft()
+                if items:
+                    self._queues[chat_id] = items  # back of the round-robin
+                return item, None
+            soonest = ready_at if soonest is None else min(soonest, ready_at)
+        return None, (None if soonest is None else soonest - now)
+
+    def _requeue_front(self, item):
+        with self._cond:
+            items = self._queues.get(item.chat_id)
+            if items is None:
+                items = self._queues[item.chat_id] = deque()
+            items.appendleft(item)
+            self._pending += 1
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                item, wait = self._next_item()
+                while item is None:
+                    self._cond.wait(wait)
+                    item, wait = self._next_item()
+                self._pending -= 1
+                self._in_flight = True
+                pause = self._next_global - time.time()
+            if pause > 0:
+                time.sleep(pause)
+            self._next_global = time.time() + self.global_interval
+            try:
+                self._deliver(item)
+            except Exception as e:
+                print(f"[ERROR] Telegram outbox sender error: {e}")
+            finally:
+                # A retry has been requeued by now, so flush() never sees a gap
+                with self._cond:
+                    self._in_flight = False
+                    self._cond.notify_all()
+
+    def _deliver(self, item):
+        item.attempts += 1
+        message_id = self._status_messages.get(item.status_key) if item.status_key else None
+        payload = {'chat_id': item.chat_id, 'text': item.text, 'parse_mode': item.parse_mode}
+        if message_id:
+            method = 'editMessageText'
+            payload['message_id'] = message_id
+        else:
+            method = 'sendMessage'
+            payload['disable_web_page_preview'] = False
+
+        retry_after = None
+        try:
+            with span('telegram_send', method=method):
+                resp = self.http.post(f"{self.api_base}/{method}", data=payload, timeout=self.timeout)
+            body = resp.json()
+        except Exception as e:
+            print(f"[DEBUG] Telegram {method} attempt {item.attempts} failed: {e}")
+            body = None
+        else:
+            if body.get('ok'):
+                self._ready_at[item.chat_id] = time.time() + self.chat_interval
+                if method == 'editMessageText':
+                    self.edited += 1
+                else:
+                    self.sent += 1
+                    if item.status_key:
+                        self._remember_status(item.status_key, body['result']['message_id'])
+                print(f"[DEBUG] Telegram {method} ok for chat {item.chat_id}")
+                return
+            if resp.status_code == 429:
+                retry_after = (body.get('parameters') or {}).get('retry_after', 1)
+                self.rate_limited += 1
+            elif method == 'editMessageText' and 'not modified' in body.get('description', ''):
+                return
+            elif 400 <= resp.status_code < 500:
+                print(f"[ERROR] Telegram {method} rejected for chat {item.chat_id}: {body.get('description')}")
+                if method == 'editMessageText':
+                    # Status message is gone or too old to edit: send the update as a new message
+                    self._status_messages.pop(item.status_key, None)
+                    self._requeue_front(item)
+                else:
+                    self.dropped += 1
+                return
+            print(f"[DEBUG] Telegram {method} attempt {item.attempts} failed: {body.get('description')}")
+
+        if retry_after is None and item.attempts >= self.max_attempts:
+            self.dropped += 1
+            print(f"[ERROR] Giving up on Telegram message for chat {item.chat_id} after {item.attempts} attempts")
+            return
+        # 429 waits exactly as long as Telegram asks; other failures back off 1, 2, 4... seconds
+        delay = retry_after if retry_after is not None else 2 ** (item.attempts - 1)
+        self._ready_at[item.chat_id] = time.time() + delay
+        self._requeue_front(item)
+
+    def _remember_status(self, status_key, message_id):
+        self._status_messages[status_key] = message_id
+        while len(self._status_messages) > 1000:
+            self._status_messages.popitem(last=False)
+
+    def stats(self):
+        return {
+            'pending': self._pending,
+            'sent': self.sent,
+            'edited': self.edited,
+            'merged': self.merged,
+            'rate_limited': self.rate_limited,
+            'dropped': self.dropped
+        }
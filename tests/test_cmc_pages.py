@@ -0,0 +1,84 @@
+import json
+import os
+
+import pytest
+
+from cmc_pages import (MarketDataParseError, pair_liquidity_from_next_data, parse_market_pairs,
+                       parse_overview_stats, parse_pair_liquidity)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures')
+POOL_URL = 'https://coinmarketcap.com/dexscan/solana/BMTpoolAddr111/'
+
+
+def read_fixture(*parts):
+    with open(os.path.join(FIXTURES_DIR, *parts), encoding='utf-8') as f:
+        return f.read()
+
+
+def next_data_page(data):
+    return f'<html><body><script id="__NEXT_DATA__" type="application/json">{json.dumps(data)}</script></body></html>'
+
+
+def test_overview_stats():
+    html = read_fixture('cmc', 'bubblemaps_overview.html')
+    assert parse_overview_stats(html, 'bubblemaps') == {'market_cap': '$27,845,124', 'volume_24h': '$8,934,512'}
+    assert parse_overview_stats(html, 35524) == {'market_cap': '$27,845,124', 'volume_24h': '$8,934,512'}
+
+
+def test_overview_stats_ignores_other_coins():
+    # Related coins come before the requested one and carry their own statistics
+    other = {'id': 1, 'slug': 'bitcoin', 'statistics': {'marketCap': 1.3e12, 'volume24h': 2.1e10}}
+    coin = {'id': 35524, 'slug': 'bubblemaps', 'statistics': {'marketCap': 27845123.55, 'volume24h': 8934512.12}}
+    html = next_data_page({'props': {'pageProps': {'related': [other], 'detail': coin}}})
+    assert parse_overview_stats(html, 'bubblemaps')['market_cap'] == '$27,845,124'
+
+
+def test_overview_stats_without_requested_coin():
+    html = read_fixture('cmc', 'bubblemaps_overview.html')
+    with pytest.raises(MarketDataParseError):
+        parse_overview_stats(html, 'bitcoin')
+    with pytest.raises(MarketDataParseError):
+        parse_overview_stats('<html></html>', 'bubblemaps')
+
+
+def test_pair_liquidity():
+    other = {'poolAddress': 'OtherPool999', 'liquidity': 9999999}
+    pool = {'poolAddress': 'BMTpoolAddr111', 'stats': {'liquidity': 312450.77}}
+    data = {'props': {'pageProps': {'trending': [other], 'pair': pool}}}
+    assert pair_liquidity_from_next_data(data, POOL_URL) == '$312,451'
+    assert pair_liquidity_from_next_data({'props': {'pageProps': {'trending': [other]}}}, POOL_URL) is None
+    # Stat box fallback
+    assert parse_pair_liquidity(read_fixture('site', 'pair.html'), POOL_URL) == '$312,450'
+    with pytest.raises(MarketDataParseError):
+        parse_pair_liquidity('<html></html>', POOL_URL)
+
+
+def test_market_pairs():
+    cex = parse_market_pairs(json.loads(read_fixture('cmc', 'bubblemaps_pairs_cex.json')))
+    assert [(m['exchange'], m['liquidity']) for m in cex] == [
+        ('Binance', '612'), ('Bybit', '538'), ('Bitget', '471'), ('Some Small Exchange', '98'), ('MEXC', '0')]
+    assert cex[0]['volume_24h'] == '$3,120,450'
+    assert cex[0]['liquidity_usd'] is None
+
+    dex = parse_market_pairs(json.loads(read_fixture('cmc', 'bubblemaps_pairs_dex.json')))
+    assert [(m['exchange'], m['liquidity'], m['liquidity_usd']) for m in dex] == [
+        ('Raydium', '402', '$312,451'), ('Meteora', '233', '$54,120')]
+    assert dex[0]['pair_url'] == POOL_URL
+
+
+@pytest.mark.parametrize('change', [
+    lambda pair: pair.pop('effectiveLiquidity'),
+    lambda pair: pair.update(effectiveLiquidity='612'),
+    lambda pair: pair.update(effectiveLiquidity=True),
+])
+def test_market_pairs_bad_liquidity_score(change):
+    payload = json.loads(read_fixture('cmc', 'bubblemaps_pairs_cex.json'))
+    change(payload['data']['marketPairs'][0])
+    with pytest.raises(MarketDataParseError):
+        parse_market_pairs(payload)
+
+
+@pytest.mark.parametrize('payload', [{}, {'data': None}, {'data': {'id': 35524}}, []])
+def test_market_pairs_malformed(payload):
+    with pytest.raises(MarketDataParseError):
+        parse_market_pairs(payload)
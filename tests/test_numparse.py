@@ -0,0 +1,45 @@
+import pytest
+
+from numparse import parse_dollar, parse_dollars, parse_number, parse_numbers, parse_score, parse_scores
+
+CASES = [
+    # en-US, as the old per-cell parsers read them
+    ('$71,241,774', 71241774),
+    ('$8.94M', 8940000),
+    ('$1.2B', 1200000000),
+    ('$3,120,450*', 3120450),
+    ('612', 612),
+    ('--', 0),
+    ('', 0),
+    (None, 0),
+    ('$1,234,567 100%', 1234567),
+    ('$567 100%', 567),
+    ('$12,34', 1234),
+    ('1,5M', 15000000),
+    ('1.234.567', 0),
+    ('12 3456', 12),
+    # Localized within one token
+    ('1.234.567,89', 1234567),
+    ('1 234 567', 1234567),
+    ('1 234 567,89', 1234567),
+    ("1'234'567", 1234567),
+    ('€1 234,5', 1234),
+]
+
+
+@pytest.mark.parametrize('text, expected', CASES)
+def test_parse_dollar(text, expected):
+    assert parse_dollar(text) == expected
+
+
+def test_parse_dollars_matches_parse_dollar():
+    texts = [text for text, _ in CASES]
+    assert parse_dollars(texts) == [expected for _, expected in CASES]
+    assert parse_numbers(texts) == [parse_number(text) for text in texts]
+    assert parse_dollars([]) == []
+
+
+def test_parse_scores():
+    cells = ['612', '--', '1,024', '', '98', 'n/a']
+    assert parse_scores(cells) == [612, 0, 1024, 0, 98, 0]
+    assert [parse_score(cell) for cell in cells] == [612, 0, 1024, 0, 98, 0]
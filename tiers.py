@@ -0,0 +1,120 @@
+from bisect import bisect_left
+
+from numparse import parse_dollar, parse_score
+from policy import Policy, short_usd
+
+# Investment tiers evaluated from the policy's tables (see policy.py) instead
+# of an if/elif chain. evaluate() returns structured fields (outcome, Min,
+# Max, commitment, Investment, trace) and render_commitment() turns them into
+# the trace string the proposal code has always used.
+
+# Built-in rules, used when the caller doesn't pass a loaded policy
+DEFAULT = Policy(None)
+
+# Outcomes
+OFFER = 'offer'
+SKIP = 'skip'
+NOT_LISTED = 'not_listed'
+NO_TIER = 'no_tier'
+
+
+def not_listed_message(policy=DEFAULT):
+    return ("the token i fetch doesnt exist in this following\n"
+            f"Tier 1: {', '.join(policy.tier1_exchanges)}\n"
+            f"Tier 2: {', '.join(policy.tier2_exchanges)}\n\n"
+            "try again with another token")
+
+
+def _result(outcome, trace, offer=None):
+    Min, Max, commitment, Investment = offer or (None, None, None, None)
+    return {'outcome': outcome, 'Min': Min, 'Max': Max, 'commitment': commitment,
+            'Investment': Investment, 'trace': trace}
+
+
+def _tier_index(table, upper_bounds, value):
+    # Index of the row whose (above, up to] range holds value, or None
+    i = bisect_left(upper_bounds, value)
+    if i < len(table) and value > table[i][0]:
+        return i
+    return None
+
+
+def _headline(snapshot, market_cap, volume, trace, policy):
+    # Market cap and volume gates; returns (volume, result) where result is set on a skip
+    trace.append(f"Market cap: {market_cap} (raw: {snapshot.get('market_cap', '')})")
+    if market_cap <= policy.min_market_cap:
+        trace.append(f"Market cap is less than ${short_usd(policy.min_market_cap)}. Skipping.")
+        return None, _result(SKIP, trace)
+    trace.append(f"24h Volume: {volume} (raw: {snapshot.get('volume_24h', '')})")
+    if volume <= policy.min_volume_24h:
+        trace.append(f"24h volume is less than ${short_usd(policy.min_volume_24h)}. Skipping.")
+        return None, _result(SKIP, trace)
+    return volume, None
+
+
+def _listing(snapshot, trace, policy):
+    cex_markets = [c for c in snapshot.get('top_cex_market') or [] if policy.is_tier_exchange(c['exchange'])]
+    trace.append(f"does cex exist? {'yes' if cex_markets else 'no'}")
+    dex_markets = snapshot.get('top_dex_market') or []
+    if cex_markets:
+        trace.append(f"does dex exist? {'yes' if dex_markets else 'no'}")
+    return cex_markets, dex_markets
+
+
+def _dex_result(dex, liquidity, tier_index, trace, policy):
+    raw = dex.get('final_liquidity') or dex.get('liquidity')
+    trace.append(f"DEX Liquidity: {liquidity} (raw: {raw})")
+    if liquidity < policy.min_dex_liquidity:
+        trace.append(f"DEX liquidity is less than ${short_usd(policy.min_dex_liquidity)}. Skipping. (Liquidity: {liquidity})")
+        return _result(SKIP, trace)
+    if tier_index is None:
+        trace.append("No suitable investment found.")
+        return _result(NO_TIER, trace)
+    _, _, label, offer = policy.dex_tiers[tier_index]
+    trace.append(f"DEX liquidity {label}. {_offer_text(offer)}")
+    return _result(OFFER, trace, offer)
+
+
+def _cex_result(volume, score, tier_index, trace, policy):
+    trace.append(f"CEX Volume: {volume}, CEX Liquidity: {score}")
+    if tier_index is not None:
+        _, _, volume_above, volume_up_to, label, offer = policy.cex_tiers[tier_index]
+        if volume_above < volume <= volume_up_to:
+            if offer is None:
+                trace.append(f"{label}. Skipping.")
+                return _result(SKIP, trace)
+            trace.append(f"{label}. {_offer_text(offer)}")
+            return _result(OFFER, trace, offer)
+    trace.append("No suitable investment found.")
+    return _result(NO_TIER, trace)
+
+
+def _offer_text(offer):
+    Min, Max, commitment, Investment = offer
+    return f"Daily transaction {Min} - {Max} minimum commitment {commitment} investment {Investment}"
+
+
+def evaluate(snapshot, policy=DEFAULT):
+    trace = []
+    volume, skipped = _headline(snapshot, parse_dollar(snapshot.get('market_cap')),
+                                parse_dollar(snapshot.get('volume_24h')), trace, policy)
+    if skipped:
+        return skipped
+    cex_markets, dex_markets = _listing(snapshot, trace, policy)
+    if not cex_markets:
+        return _result(NOT_LISTED, trace)
+    if dex_markets:
+        dex = dex_markets[0]
+        liquidity = parse_dollar(dex.get('final_liquidity') or dex.get('liquidity'))
+        tier_index = _tier_index(policy.dex_tiers, policy.dex_upper, liquidity)
+        return _dex_result(dex, liquidity, tier_index, trace, policy)
+    score = max(parse_score(c.get('liquidity', '0')) for c in cex_markets)
+    tier_index = _tier_index(policy.cex_tiers, policy.cex_upper, score)
+    return _cex_result(volume, score, tier_index, trace, policy)
+
+
+def render_commitment(result, policy=DEFAULT):
+    # The investment_commitment string the proposal code expects
+    if result['outcome'] == NOT_LISTED:
+        return not_listed_message(policy)
+    return " -> ".join(result['trace'])